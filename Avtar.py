@@ -1,5 +1,7 @@
 import streamlit as st
-import openai
+from llm import chat_completion
+from tracing import span, render_debug_panel
+from session_store import session_id, restore_conversation, persist_conversation, reset_conversation
 
 # -------------------- CONFIG --------------------
 st.set_page_config(page_title="Multi-Agent Roleplay", layout="wide")
@@ -10,7 +12,6 @@ api_key = st.text_input("Enter your OpenAI API Key", type="password")
 if not api_key:
     st.warning("Please enter your API key to continue.")
     st.stop()
-openai.api_key = api_key
 
 # -------------------- ROLEPLAY SCENARIOS --------------------
 SCENARIOS = {
@@ -112,8 +113,7 @@ st.markdown("## Instructions (Exam Style)")
 st.markdown(scenario["instructions"])
 
 # -------------------- SESSION STATE --------------------
-if "conversation" not in st.session_state:
-    st.session_state.conversation = [{"role": "system", "content": scenario["system_prompt"]}]
+restore_conversation([{"role": "system", "content": scenario["system_prompt"]}])
 
 # -------------------- CHAT INPUT --------------------
 if input_mode == "Write":
@@ -125,9 +125,11 @@ if st.button("Send") and user_input.strip() != "":
     st.session_state.conversation.append({"role": "user", "content": user_input})
 
     try:
-        response = openai.ChatCompletion.create(
+        response = chat_completion(
+            api_key,
             model="gpt-4o-mini",
             messages=st.session_state.conversation,
+            usage={"app": "avtar", "session": session_id(), "scenario": scenario_choice},
             temperature=0.7,
             max_tokens=500,
         )
@@ -136,18 +138,20 @@ if st.button("Send") and user_input.strip() != "":
         assistant_reply = f"Error: {str(e)}"
 
     st.session_state.conversation.append({"role": "assistant", "content": assistant_reply})
+    persist_conversation()
 
 # -------------------- DISPLAY CHAT --------------------
 st.markdown("## Conversation")
-for msg in st.session_state.conversation:
-    if msg["role"] == "user":
-        st.markdown(f"**You:** {msg['content']}")
-    elif msg["role"] == "assistant":
-        st.markdown(f"**Role Partner:** {msg['content']}")
+with span("avtar.render_conversation", messages=len(st.session_state.conversation)):
+    for msg in st.session_state.conversation:
+        if msg["role"] == "user":
+            st.markdown(f"**You:** {msg['content']}")
+        elif msg["role"] == "assistant":
+            st.markdown(f"**Role Partner:** {msg['content']}")
 
 # -------------------- RESET BUTTON --------------------
 if st.button("Reset Conversation"):
-    st.session_state.conversation = [{"role": "system", "content": scenario["system_prompt"]}]
+    reset_conversation([{"role": "system", "content": scenario["system_prompt"]}])
     st.experimental_rerun()
 
 # -------------------- CONVERSATION LOG --------------------
@@ -171,3 +175,5 @@ if show_analysis:
 - Teacher alignment to school goals: Emerging throughout dialogue  
 - Potential miscommunication: Risk of misunderstanding self-directed learning  
     """)
+
+render_debug_panel()
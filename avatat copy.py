@@ -1,13 +1,12 @@
 import streamlit as st
-import openai
+from llm import chat_completion
+from tracing import span, render_debug_panel
+from session_store import session_id, restore_conversation, persist_conversation, reset_conversation
 
 st.title("Principal Conversation Role-Play")
 api_key = st.text_input("🔑 Enter your key", type="password")
 
-if api_key:
-    openai.api_key = api_key
-    # Now you can safely use the key
-else:
+if not api_key:
     st.warning("Please enter your OpenAI API key to continue.")
 
 # Instructions for scenarios
@@ -184,12 +183,11 @@ st.write("Input type: Text (audio not supported currently)")
 st.markdown("### Instructions for Teacher (User)")
 st.markdown(get_instructions(scenario))
 
-# Initialize conversation log in session state
-if "conversation" not in st.session_state:
-    # Start conversation with system prompt as context
-    st.session_state.conversation = [
-        {"role": "system", "content": get_system_prompt(scenario)}
-    ]
+# Initialize conversation log (restored from the session store after a restart)
+# Start conversation with system prompt as context
+restore_conversation([
+    {"role": "system", "content": get_system_prompt(scenario)}
+])
 
 # User input
 user_input = st.text_input("You (Teacher):", key="user_input")
@@ -200,9 +198,11 @@ if st.button("Send") and user_input.strip() != "":
 
     # Call OpenAI ChatCompletion
     try:
-        response = openai.ChatCompletion.create(
+        response = chat_completion(
+            api_key,
             model="gpt-4o-mini",
             messages=st.session_state.conversation,
+            usage={"app": "avatar_copy", "session": session_id(), "scenario": scenario},
             temperature=0.7,
             max_tokens=512,
             n=1,
@@ -214,16 +214,20 @@ if st.button("Send") and user_input.strip() != "":
 
     # Append assistant response to conversation
     st.session_state.conversation.append({"role": "assistant", "content": assistant_reply})
+    persist_conversation()
 
 # Display conversation
 if "conversation" in st.session_state:
-    for msg in st.session_state.conversation:
-        if msg["role"] == "user":
-            st.markdown(f"**You:** {msg['content']}")
-        elif msg["role"] == "assistant":
-            st.markdown(f"**Principal:** {msg['content']}")
+    with span("avatar_copy.render_conversation", messages=len(st.session_state.conversation)):
+        for msg in st.session_state.conversation:
+            if msg["role"] == "user":
+                st.markdown(f"**You:** {msg['content']}")
+            elif msg["role"] == "assistant":
+                st.markdown(f"**Principal:** {msg['content']}")
 
 # Button to clear conversation
 if st.button("Reset Conversation"):
-    st.session_state.conversation = [{"role": "system", "content": get_system_prompt(scenario)}]
+    reset_conversation([{"role": "system", "content": get_system_prompt(scenario)}])
     st.experimental_rerun()
+
+render_debug_panel()
@@ -1,7 +1,13 @@
+import hashlib
+import os
+
 import streamlit as st
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
+from compiled_forest import ParityError, export_forest, load_forest
+from gridded import DATA_PATH, REGIONS, load_regional_series
+from tracing import span, set_attributes, render_debug_panel
+
+MODEL_DIR = os.environ.get("CLIMATE_MODEL_DIR", "models")
 
 st.set_page_config(page_title="Tanzania Climate Analysis", layout="wide")
 st.title(" Climate Change Analysis - Tanzania")
@@ -35,35 +41,96 @@ def load_data():
 
     return df
 
-df = load_data()
+@st.cache_data(show_spinner="Reducing gridded data...")
+def load_gridded(path, region):
+    # Only the monthly regional series is cached; the cube itself stays on disk
+    return load_regional_series(path, region)
 
-if not df.empty:
-    # Sidebar Inputs
-    st.sidebar.header("User Input")
-    month = st.sidebar.slider('Select Month', 1, 12, 1)
-    year = 2025  # fixed dummy year
-
-    # Train model
+@st.cache_resource
+def train_model(df):
     features = df[['Year', 'Month']]
     target = df['Temperature']
 
+    # Forests are stored compiled and memory-mapped, keyed by their training data,
+    # so restarts and other server processes load them without refitting
+    key = hashlib.sha256(pd.util.hash_pandas_object(pd.concat([features, target], axis=1), index=False).values)
+    path = os.path.join(MODEL_DIR, f"temperature-{key.hexdigest()[:16]}.forest")
+    if os.path.isdir(path):
+        with span("climate.model_load"):
+            return load_forest(path)
+
+    # sklearn is only imported once a model has to be fitted
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import train_test_split
+
     X_train, X_test, y_train, y_test = train_test_split(features, target, test_size=0.2, random_state=42)
 
     model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    with span("climate.model_fit", rows=len(X_train)):
+        model.fit(X_train, y_train)
+    with span("climate.model_export") as current:
+        try:
+            forest = export_forest(model, path, features)
+        except ParityError as e:
+            # Nothing is saved, so the sklearn model is kept here and refitted after a restart
+            set_attributes(current, parity_error=str(e))
+            return model
+        set_attributes(current, nodes=len(forest.feature))
+    return forest
+
+st.sidebar.header("User Input")
+source = st.sidebar.radio("Data Source", ["National average (chart.csv)", "Gridded data (NetCDF/Zarr)"])
+gridded = source.startswith("Gridded")
+
+if gridded:
+    path = st.sidebar.text_input("NetCDF file, glob or Zarr store", DATA_PATH)
+    region = st.sidebar.selectbox("Region", list(REGIONS))
+    df = pd.DataFrame()
+    if path:
+        try:
+            with span("climate.load_gridded", region=region):
+                df = load_gridded(path, region)
+        except (ImportError, OSError, ValueError, KeyError) as e:
+            st.error(f"Could not read gridded data: {e}")
+else:
+    with span("climate.load_data"):
+        df = load_data()
+
+if "Temperature" in df and not df.empty:
+    # Sidebar Inputs
+    month = st.sidebar.slider('Select Month', 1, 12, 1)
+    if gridded:
+        first, last = int(df['Year'].min()), int(df['Year'].max())
+        # A random forest cannot extrapolate: later years would repeat the last one
+        year = st.sidebar.slider('Select Year', first, last, last)
+    else:
+        year = 2025  # fixed dummy year
 
-    prediction = model.predict([[year, month]])[0]
+    # Train model (cached across reruns)
+    model = train_model(df)
+
+    with span("climate.predict"):
+        prediction = model.predict([[year, month]])[0]
 
     # Display result
     st.subheader("📈 Forecasted Temperature")
     st.write(f"Predicted Avg Temperature for **{year}-{month:02d}**: 🌡️ **{prediction:.2f} °C**")
+    if gridded:
+        st.caption(f"Model estimate within the data ({first}–{last}); it does not project trends beyond {last}.")
 
     # Historical Trend Chart
     if st.checkbox("📊 Show Temperature Trend by Month"):
-        st.line_chart(df[['Month', 'Temperature']].set_index('Month').sort_index())
+        st.line_chart(df.groupby('Month')[['Temperature']].mean())
+
+    if gridded and st.checkbox("📉 Show Monthly Anomalies"):
+        anomaly_columns = [c for c in ('TemperatureAnomaly', 'PrecipitationAnomaly') if c in df]
+        dates = pd.to_datetime(dict(year=df['Year'], month=df['Month'], day=1))
+        st.line_chart(df[anomaly_columns].set_index(dates))
 
     # Footer
     st.markdown("---")
     st.caption("Data Source: [World Bank Climate Portal](https://github.com/ErumAfzal/Climate-Project-in-Tanzania)")
 else:
     st.warning("No data available to display.")
+
+render_debug_panel()
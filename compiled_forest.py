@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# --- Compiled random forests ---
+# A trained sklearn forest is flattened into a few contiguous arrays shared by
+# all trees (one row per node), saved as .npy files and memory-mapped on load.
+# Loading is near-instant, the pages are shared between processes through the
+# OS page cache, and prediction walks all trees for a batch of rows at once
+# with NumPy gathers instead of sklearn's per-call validation.
+#
+#   forest = export_forest(model, "models/climate.forest", X_train)
+#   forest = load_forest("models/climate.forest")
+#   forest.predict([[2025, 1]])
+#
+# Leaves point to themselves with threshold +inf, so every row can take the
+# same number of steps (the forest's depth) without branching.
+
+ARRAYS = ("feature", "threshold", "children", "missing_left", "value", "roots")
+PREDICT_BATCH = 4096
+TOLERANCE = 1e-9
+
+
+class CompiledForest:
+    def __init__(self, arrays, meta):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta
+        self.depth = meta["depth"]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def apply(self, X):
+        """Leaf node (global index) reached by every row in every tree: (rows, trees)."""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = (x <= self.threshold[nodes]) | (np.isnan(x) & self.missing_left[nodes])
+            nodes = self.children[nodes, (~go_left).view(np.int8)]
+        return nodes
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.meta["n_features"]:
+            raise ValueError(f"Expected {self.meta['n_features']} features, got shape {X.shape}")
+        out = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), PREDICT_BATCH):
+            leaves = self.apply(X[start:start + PREDICT_BATCH])
+            out[start:start + PREDICT_BATCH] = self.value[leaves].mean(axis=1)
+        return out[:, 0] if self.meta["n_outputs"] == 1 else out
+
+
+def compile_forest(model):
+    """Flatten a fitted RandomForestRegressor (or a single regression tree)."""
+    estimators = getattr(model, "estimators_", [model])
+    parts = {name: [] for name in ARRAYS}
+    offset, depth = 0, 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        n = tree.node_count
+        leaf = tree.children_left == -1
+        own = np.arange(n)
+        parts["feature"].append(np.where(leaf, 0, tree.feature))
+        parts["threshold"].append(np.where(leaf, np.inf, tree.threshold))
+        parts["children"].append(np.stack([
+            np.where(leaf, own, tree.children_left),
+            np.where(leaf, own, tree.children_right),
+        ], axis=1) + offset)
+        # Older sklearn versions do not route missing values
+        missing = getattr(tree, "missing_go_to_left", None)
+        parts["missing_left"].append(np.zeros(n, bool) if missing is None else missing.astype(bool) & ~leaf)
+        parts["value"].append(tree.value[:, :, 0])
+        parts["roots"].append([offset])
+        offset += n
+        depth = max(depth, tree.max_depth)
+
+    dtypes = {"feature": np.int32, "threshold": np.float64, "children": np.int32,
+              "missing_left": bool, "value": np.float64, "roots": np.int32}
+    arrays = {name: np.ascontiguousarray(np.concatenate(parts[name]), dtype=dtypes[name]) for name in ARRAYS}
+    meta = {
+        "n_features": int(estimators[0].n_features_in_),
+        "n_outputs": int(estimators[0].n_outputs_),
+        "depth": int(depth),
+        "feature_names": [str(n) for n in getattr(model, "feature_names_in_", [])],
+    }
+    return CompiledForest(arrays, meta)
+
+
+def save_forest(forest, path):
+    """Write one .npy per array into a directory; replaces it atomically."""
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".forest-")
+    for name in ARRAYS:
+        np.save(os.path.join(tmp, f"{name}.npy"), getattr(forest, name))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(forest.meta, f)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+
+
+def load_forest(path, mmap=True):
+    mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ARRAYS}
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    return CompiledForest(arrays, meta)
+
+
+def parity_error(model, forest, X):
+    """Largest absolute difference between sklearn's and the compiled predictions."""
+    X = np.asarray(X, dtype=np.float32)
+    return float(np.max(np.abs(model.predict(X) - forest.predict(X)), initial=0.0))
+
+
+class ParityError(ValueError):
+    pass
+
+
+def export_forest(model, path, X):
+    """Compile, check against sklearn on X, then save and return the memory-mapped forest."""
+    forest = compile_forest(model)
+    error = parity_error(model, forest, X)
+    if error > TOLERANCE:
+        # Never leave a forest on disk that other processes would load unchecked
+        shutil.rmtree(path, ignore_errors=True)
+        raise ParityError(f"Compiled forest differs from sklearn by {error}")
+    save_forest(forest, path)
+    return load_forest(path)
+
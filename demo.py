@@ -1,17 +1,17 @@
 import streamlit as st
-import openai
 import json
 import os
 from datetime import datetime
+from llm import chat_completion
+from tracing import span, render_debug_panel
+from session_store import session_id, restore_conversation, persist_conversation, reset_conversation
 
 st.set_page_config(page_title="Lehrkraft-Schulleitung Rollenspiel", layout="wide")
 st.title("Teacher-Principal Role-Play Chatbot")
 
 api_key = st.text_input("🔑 OpenAI API-Schlüssel eingeben / Enter your API key", type="password")
 
-if api_key:
-    openai.api_key = api_key
-else:
+if not api_key:
     st.warning("Bitte API-Schlüssel eingeben / Please enter your OpenAI API key to continue.")
 
 # Instructions (do not change)
@@ -64,10 +64,9 @@ scenario = st.selectbox(
 st.markdown("### 🧾 Anweisungen für die Lehrkraft / Instructions for Teacher")
 st.markdown(get_instructions(scenario))
 
-if "conversation" not in st.session_state:
-    st.session_state.conversation = [
-        {"role": "system", "content": get_system_prompt(scenario)}
-    ]
+restore_conversation([
+    {"role": "system", "content": get_system_prompt(scenario)}
+])
 
 user_input = st.text_input("💬 Sie (Lehrkraft) / You (Teacher):", key="user_input")
 
@@ -75,9 +74,11 @@ if st.button("📤 Senden / Send") and user_input.strip() != "":
     st.session_state.conversation.append({"role": "user", "content": user_input})
 
     try:
-        response = openai.ChatCompletion.create(
+        response = chat_completion(
+            api_key,
             model="gpt-4o-mini",
             messages=st.session_state.conversation,
+            usage={"app": "demo", "session": session_id(), "scenario": scenario},
             temperature=0.7,
             max_tokens=512,
             n=1,
@@ -88,16 +89,18 @@ if st.button("📤 Senden / Send") and user_input.strip() != "":
         assistant_reply = f"Fehler / Error: {str(e)}"
 
     st.session_state.conversation.append({"role": "assistant", "content": assistant_reply})
+    persist_conversation()
 
 # Show conversation history
 if "conversation" in st.session_state:
     st.markdown("---")
     st.subheader("🗨️ Verlauf / Conversation Log")
-    for msg in st.session_state.conversation:
-        if msg["role"] == "user":
-            st.markdown(f"**Sie:** {msg['content']}")
-        elif msg["role"] == "assistant":
-            st.markdown(f"**Schulleitung / Principal:** {msg['content']}")
+    with span("demo.render_conversation", messages=len(st.session_state.conversation)):
+        for msg in st.session_state.conversation:
+            if msg["role"] == "user":
+                st.markdown(f"**Sie:** {msg['content']}")
+            elif msg["role"] == "assistant":
+                st.markdown(f"**Schulleitung / Principal:** {msg['content']}")
 
 # Save chat log
 if st.button("💾 Verlauf speichern / Save Chat Log"):
@@ -127,7 +130,9 @@ if st.button("🧠 Auswertung anzeigen / Show Evaluation"):
     st.markdown(evaluation_summary)
 
 if st.button("🔄 Neu starten / Reset Conversation"):
-    st.session_state.conversation = [
+    reset_conversation([
         {"role": "system", "content": get_system_prompt(scenario)}
-    ]
+    ])
     st.experimental_rerun()
+
+render_debug_panel()
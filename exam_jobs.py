@@ -0,0 +1,327 @@
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from llm import chat_completion
+from tracing import span, set_attributes
+from ingest import open_passage_index, ingest_files, select_context, indexed_docs, new_ocr_stats, ocr_report
+from question_bank import open_bank, parse_questions, add_questions
+
+# --- Background exam generation ---
+# The Streamlit app only saves the uploads under jobs/<id>/ and submits a job;
+# a worker process started per job (`python exam_jobs.py worker <job id>`)
+# indexes the uploads (with OCR), then generates the questions topic by topic.
+# Both steps are checkpointed, so reruns and disconnects lose nothing.
+#
+# The OpenAI key never touches the database: it is handed to the worker in its
+# environment (OPENAI_API_KEY). A job whose worker died is resumed by the
+# session that submitted it, with that session's key.
+
+DB_PATH = "exam_jobs.db"
+JOBS_DIR = "jobs"
+LEASE_SECONDS = 120
+HEARTBEAT_SECONDS = 15
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    status TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    worker TEXT,
+    heartbeat REAL,
+    ingested INTEGER NOT NULL DEFAULT 0,
+    ocr TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_topics (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    questions TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created);
+"""
+
+QUESTION_TYPE_INSTRUCTIONS = {
+    "Gemischt": "",
+    "Offene Fragen": "Es sollen ausschließlich offene Fragen sein.",
+    "Multiple Choice": "Es sollen ausschließlich Multiple-Choice-Fragen mit je vier Antwortmöglichkeiten und einer richtigen Antwort sein.",
+    "Fallbasiert": "Die Fragen sollen auf kurzen Unterrichts- oder Alltagssituationen basieren (Fallvignetten)."
+}
+
+
+# --- Question Generator ---
+def generate_questions(api_key, passage, topic_title, question_count, question_type, usage=None, source=""):
+    system_prompt = (
+        "Du bist ein Bildungsexperte, der Fragen auf EQF-Niveau 6–7 erstellt. "
+        "Berücksichtige relevante Bildungstheorien, reale Unterrichtssituationen und "
+        "eine wissenschaftliche Tiefe. Verwende eine akademische Sprache auf Deutsch. "
+        f"Jede Frage muss thematisch zum folgenden Bereich passen: '{topic_title}'."
+    )
+
+    user_prompt = (
+        f"Generiere bitte {question_count} akademische Prüfungsfragen (offen oder MC) zum Thema '{topic_title}'. "
+        f"{QUESTION_TYPE_INSTRUCTIONS[question_type]} "
+        "Die Fragen sollen auf Deutsch sein, keine Duplikate enthalten und das Antwortoptionenformat "
+        "dem in den Beispielprüfungen entsprechen (z.B. Anzahl der Antwortmöglichkeiten). "
+        "Verwende den folgenden deutschen Inhalt zur Inspiration:\n\n"
+        f"{passage}\n\n"
+        "Die Fragen sollen geeignet für Lehramtsstudierende auf Master-Niveau sein, Theorie und Praxis verbinden "
+        "und kritisch-reflexives Denken fördern.\n\n"
+        "Antworte ausschließlich mit einem JSON-Array. Jedes Element hat die Felder "
+        "\"frage\" (Text), \"optionen\" (Liste der Antwortmöglichkeiten, leer bei offenen Fragen) "
+        "und \"antwort\" (richtige Antwort bzw. Erwartungshorizont)."
+    )
+
+    response = chat_completion(
+        api_key,
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        usage=usage,
+        temperature=0.4,
+        max_tokens=1800
+    )
+
+    # Parse into records (JSON, falling back to blank-line separated blocks)
+    raw = response.choices[0].message.content.strip()
+    return parse_questions(raw, topic_title, question_type, source=source)
+
+
+# --- Queue ---
+_local = threading.local()
+
+
+def open_queue(path=DB_PATH):
+    """The calling thread's connection; sqlite3 connections are not shared across threads."""
+    conns = _local.__dict__.setdefault("conns", {})
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conns[path] = conn
+    return conn
+
+
+def submit_job(conn, uploaded_files, topics, question_type):
+    """Save the uploads and queue one generation job. Returns the job id."""
+    job_id = uuid.uuid4().hex[:12]
+    job_dir = os.path.join(JOBS_DIR, job_id)
+
+    # Uploads only live in the browser session: keep a copy for the worker
+    for i, f in enumerate(uploaded_files):
+        folder = os.path.join(job_dir, "uploads", str(i))
+        os.makedirs(folder)
+        f.seek(0)
+        with open(os.path.join(folder, os.path.basename(f.name)), "wb") as out:
+            shutil.copyfileobj(f, out)
+
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO jobs (id, created, status, question_type, dir) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, time.time(), question_type, job_dir),
+        )
+        conn.executemany(
+            "INSERT INTO job_topics (job_id, position, topic, count) VALUES (?, ?, ?, ?)",
+            [(job_id, i, topic, count) for i, (topic, count) in enumerate(topics)],
+        )
+    return job_id
+
+
+def claim_job(conn, job_id, token, lease=LEASE_SECONDS):
+    """Make `token` the job's owner, unless another worker still holds a live lease."""
+    now = time.time()
+    cursor = conn.execute(
+        "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ? "
+        "WHERE id = ? AND status IN ('queued', 'running') "
+        "AND (worker = ? OR worker IS NULL OR heartbeat < ?)",
+        (token, now, job_id, token, now - lease),
+    )
+    return cursor.rowcount == 1
+
+
+def job_progress(conn, job_id):
+    """Status, finished/total topics and per-topic results for the UI to poll."""
+    job = conn.execute("SELECT id, created, status, ingested, ocr, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if job is None:
+        return None
+    topics = []
+    for row in conn.execute("SELECT * FROM job_topics WHERE job_id = ? ORDER BY position", (job_id,)):
+        topic = dict(row)
+        topic["questions"] = json.loads(topic["questions"]) if topic["questions"] else []
+        topics.append(topic)
+    finished = sum(1 for t in topics if t["status"] in ("done", "failed"))
+    return {**dict(job), "finished": finished, "total": len(topics), "topics": topics}
+
+
+def recent_jobs(conn, limit=10):
+    return [dict(r) for r in conn.execute(
+        "SELECT id, created, status FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+    )]
+
+
+class Heartbeat(threading.Thread):
+    """Renews the job's lease while the job runs; sets `lost` if another worker took over."""
+
+    def __init__(self, path, job_id, token):
+        super().__init__(daemon=True)
+        self.path, self.job_id, self.token = path, job_id, token
+        self.lost = threading.Event()
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = open_queue(self.path)
+        while not self.stopped.wait(HEARTBEAT_SECONDS):
+            cursor = conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ?", (time.time(), self.job_id, self.token)
+            )
+            if cursor.rowcount == 0:
+                self.lost.set()
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+
+def _remove_job_files(job):
+    shutil.rmtree(job["dir"], ignore_errors=True)
+
+
+def _uploads(job):
+    uploads = os.path.join(job["dir"], "uploads")
+    for i in sorted(os.listdir(uploads), key=int):
+        for name in os.listdir(os.path.join(uploads, i)):
+            yield os.path.join(uploads, i, name)
+
+
+def ingest_job(conn, job, passage_db):
+    """Index the saved uploads; the finished index is the job's first checkpoint."""
+    # A worker that died while indexing left a partial index behind
+    if os.path.exists(passage_db):
+        os.remove(passage_db)
+    ocr_stats = new_ocr_stats()
+    passage_index = open_passage_index(passage_db)
+    for path in _uploads(job):
+        with open(path, "rb") as f:
+            ingest_files(passage_index, [f], ocr_stats)
+    passage_index.close()
+    cursor = conn.execute(
+        "UPDATE jobs SET ingested = 1, ocr = ? WHERE id = ? AND worker = ?",
+        (ocr_report(ocr_stats), job["id"], job["worker"]),
+    )
+    # After a takeover the new owner still needs the uploads
+    if cursor.rowcount == 1:
+        shutil.rmtree(os.path.join(job["dir"], "uploads"), ignore_errors=True)
+
+
+def run_job(conn, job, bank, api_key, lost):
+    """Index the uploads if needed, then generate every topic without a checkpoint, until the lease is `lost`."""
+    passage_db = os.path.join(job["dir"], "passages.db")
+    if not job["ingested"]:
+        ingest_job(conn, job, passage_db)
+    passage_index = open_passage_index(passage_db)
+    # Questions keep a reference to the uploads, not the prompt context itself
+    source = ", ".join(indexed_docs(passage_index))
+    pending = conn.execute(
+        "SELECT * FROM job_topics WHERE job_id = ? AND status != 'done' ORDER BY position", (job["id"],)
+    ).fetchall()
+
+    for topic in pending:
+        if lost.is_set():
+            break
+        try:
+            with span("generate_questions", job=job["id"], topic=topic["topic"], requested=topic["count"]) as current:
+                passage = select_context(passage_index, topic["topic"])
+                questions = generate_questions(
+                    api_key, passage, topic["topic"], topic["count"], job["question_type"],
+                    usage={"app": "exam_generator", "session": job["id"], "topic": topic["topic"]},
+                    source=source,
+                )
+                set_attributes(current, passage_chars=len(passage), questions=len(questions))
+            add_questions(bank, questions)
+            conn.execute(
+                "UPDATE job_topics SET status = 'done', questions = ?, error = NULL WHERE job_id = ? AND position = ?",
+                (json.dumps(questions, ensure_ascii=False), job["id"], topic["position"]),
+            )
+        except Exception as e:
+            conn.execute(
+                "UPDATE job_topics SET status = 'failed', error = ? WHERE job_id = ? AND position = ?",
+                (str(e), job["id"], topic["position"]),
+            )
+
+    passage_index.close()
+    if lost.is_set():
+        # The new owner finishes the job and cleans up
+        return
+    done = conn.execute(
+        "SELECT COUNT(*) FROM job_topics WHERE job_id = ? AND status = 'done'", (job["id"],)
+    ).fetchone()[0]
+    if done:
+        conn.execute("UPDATE jobs SET status = 'done' WHERE id = ? AND worker = ?", (job["id"], job["worker"]))
+    else:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ? WHERE id = ? AND worker = ?",
+            ("Für keinen Themenbereich wurden Fragen generiert", job["id"], job["worker"]),
+        )
+    _remove_job_files(job)
+
+
+def work(job_id, token, api_key, path=DB_PATH):
+    """Worker process body: run one job if its lease can be taken."""
+    conn = open_queue(path)
+    if not claim_job(conn, job_id, token):
+        return
+    job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    heartbeat = Heartbeat(path, job_id, token)
+    heartbeat.start()
+    try:
+        run_job(conn, job, open_bank(), api_key, heartbeat.lost)
+    except Exception as e:
+        conn.execute("UPDATE jobs SET status = 'failed', error = ? WHERE id = ? AND worker = ?", (str(e), job_id, token))
+        _remove_job_files(job)
+    finally:
+        heartbeat.stop()
+
+
+# --- Worker process management ---
+def start_worker(conn, job_id, api_key):
+    """Start a worker for the job unless one holds a live lease. Returns True if started."""
+    token = uuid.uuid4().hex
+    # Taking the lease here first means concurrent callers cannot both start one
+    if not claim_job(conn, job_id, token):
+        return False
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "worker", job_id, token],
+        cwd=os.getcwd(),
+        env={**os.environ, "OPENAI_API_KEY": api_key},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return True
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "worker" and os.environ.get("OPENAI_API_KEY"):
+        # Without a token (started by hand) the job is only taken over once its lease expired
+        work(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else uuid.uuid4().hex, os.environ["OPENAI_API_KEY"])
+    else:
+        print("Usage: OPENAI_API_KEY=... python exam_jobs.py worker <job id>")
@@ -0,0 +1,165 @@
+import glob
+import os
+
+from tracing import span, set_attributes
+
+# --- Gridded climate data (NetCDF / Zarr) ---
+# Reanalysis and projection cubes are opened lazily as chunked dask arrays:
+# only the chunks covering the selected region are read, and reductions run
+# chunk by chunk, so files far larger than RAM are never loaded whole.
+# Zarr stores are read chunk by chunk; NetCDF-4/HDF5 files through lazily
+# indexed slices (NetCDF-3 files are memory-mapped by the scipy backend).
+#
+# The result is a monthly regional series in the same shape as chart.csv
+# (Year, Month, MonthName, Temperature, Precipitation), so climate_app.py
+# forecasts and charts it unchanged.
+#
+#   GRIDDED_DATA_PATH=data/era5_tz.zarr streamlit run climate_app.py
+#   python gridded.py data/cru_ts_*.nc --region "Lake Victoria"
+
+DATA_PATH = os.environ.get("GRIDDED_DATA_PATH", "")
+TIME_CHUNK = int(os.environ.get("GRIDDED_TIME_CHUNK", 120))
+WORKERS = int(os.environ.get("GRIDDED_WORKERS", min(4, os.cpu_count() or 1)))
+BASELINE = ("1991", "2020")
+
+# (lat_min, lat_max, lon_min, lon_max)
+REGIONS = {
+    "Tanzania": (-11.75, -0.95, 29.3, 40.5),
+    "Lake Victoria": (-3.2, -0.95, 31.5, 34.1),
+    "Northern Highlands": (-4.5, -2.5, 35.5, 38.0),
+    "Coast": (-10.5, -4.5, 38.0, 40.5),
+    "Central Plateau": (-7.5, -4.5, 33.5, 36.5),
+    "Southern Highlands": (-10.0, -7.5, 32.5, 36.0),
+}
+
+# Common names in ERA5, CMIP, CRU and CHIRPS files
+TEMPERATURE_NAMES = ("tas", "t2m", "tmp", "temperature", "air")
+PRECIPITATION_NAMES = ("pr", "tp", "pre", "precip", "precipitation")
+COORD_NAMES = {"latitude": "lat", "longitude": "lon", "valid_time": "time"}
+MONTH_NAMES = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def open_gridded(path, chunks=None):
+    """Open a NetCDF file, a glob of NetCDF files or a Zarr store lazily."""
+    import xarray as xr
+
+    if os.path.isdir(path) or path.rstrip("/").endswith(".zarr"):
+        # Use the store's own chunking so every read is one whole chunk
+        ds = xr.open_zarr(path, chunks={} if chunks is None else chunks)
+    else:
+        chunks = chunks or {"time": TIME_CHUNK}
+        paths = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+        if not paths:
+            raise FileNotFoundError(path)
+        if len(paths) == 1:
+            ds = xr.open_dataset(paths[0], chunks=chunks)
+        else:
+            ds = xr.open_mfdataset(paths, chunks=chunks, combine="by_coords")
+    return ds.rename({k: v for k, v in COORD_NAMES.items() if k in ds.variables})
+
+
+def find_variable(ds, names):
+    for name in names:
+        if name in ds.data_vars:
+            return ds[name]
+    return None
+
+
+def select_region(da, region):
+    """Crop to a region name or bbox; latitude may be stored in either order."""
+    lat_min, lat_max, lon_min, lon_max = REGIONS[region] if isinstance(region, str) else region
+    lat = da["lat"].values
+    lat_slice = slice(lat_min, lat_max) if lat[0] <= lat[-1] else slice(lat_max, lat_min)
+    # Files on a 0..360 grid need no change: Tanzania lies east of Greenwich
+    return da.sel(lat=lat_slice, lon=slice(lon_min, lon_max))
+
+
+def regional_mean(da, region="Tanzania"):
+    """Area-weighted (cos latitude) mean over a region, still lazy."""
+    import numpy as np
+
+    da = select_region(da, region)
+    weights = np.cos(np.deg2rad(da["lat"]))
+    return da.weighted(weights).mean(("lat", "lon"))
+
+
+def to_celsius(da):
+    if da.attrs.get("units") in ("K", "kelvin", "Kelvin"):
+        da = da - 273.15
+    return da
+
+
+def to_monthly_total(da):
+    """Precipitation as mm per month, from rates (mm/day, kg m-2 s-1, m/day) or monthly totals."""
+    units = da.attrs.get("units", "mm/day")
+    if "month" in units:
+        return da.resample(time="MS").sum()
+    if units == "kg m-2 s-1":
+        da = da * 86400
+    elif units == "m":
+        da = da * 1000
+    return da.resample(time="MS").mean() * da["time"].resample(time="MS").first().dt.days_in_month
+
+
+def monthly_climatology(da, baseline=BASELINE):
+    """Mean per calendar month over the baseline period (works on grids and series)."""
+    if baseline:
+        period = da.sel(time=slice(*baseline))
+        if period.sizes["time"]:
+            da = period
+    return da.groupby("time.month").mean("time")
+
+
+def anomalies(da, climatology):
+    return da.groupby("time.month") - climatology
+
+
+def compute(*objects):
+    """Run the lazy graphs with a bounded thread pool: peak memory ~ WORKERS chunks."""
+    import dask
+
+    with dask.config.set(scheduler="threads", num_workers=WORKERS):
+        return dask.compute(*objects)
+
+
+def load_regional_series(path, region="Tanzania", baseline=BASELINE):
+    """Monthly regional series as a chart.csv-like DataFrame, plus anomaly columns."""
+    import pandas as pd
+
+    with span("gridded.open", path=path) as current:
+        ds = open_gridded(path)
+        set_attributes(current, variables=len(ds.data_vars), time_steps=ds.sizes.get("time", 0))
+
+    series = {}
+    temperature = find_variable(ds, TEMPERATURE_NAMES)
+    if temperature is not None:
+        series["Temperature"] = to_celsius(regional_mean(temperature, region)).resample(time="MS").mean()
+    precipitation = find_variable(ds, PRECIPITATION_NAMES)
+    if precipitation is not None:
+        series["Precipitation"] = to_monthly_total(regional_mean(precipitation, region))
+    if not series:
+        raise ValueError(f"No temperature or precipitation variable in {path}: {list(ds.data_vars)}")
+
+    with span("gridded.reduce", region=region, variables=len(series)):
+        # One pass over the file for all variables; the results are a few hundred values
+        values = dict(zip(series, compute(*series.values())))
+
+    df = pd.DataFrame({name: da.to_series() for name, da in values.items()})
+    for name, da in values.items():
+        df[f"{name}Anomaly"] = anomalies(da, monthly_climatology(da, baseline)).to_series().values
+    times = pd.DatetimeIndex(df.index)
+    df.insert(0, "Year", times.year)
+    df.insert(1, "Month", times.month)
+    df.insert(2, "MonthName", [MONTH_NAMES[m - 1] for m in times.month])
+    ds.close()
+    return df.dropna(subset=list(values)).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Regional monthly series from gridded climate data.")
+    parser.add_argument("path", help="NetCDF file, glob or Zarr store")
+    parser.add_argument("--region", default="Tanzania", choices=list(REGIONS))
+    args = parser.parse_args()
+    print(load_regional_series(args.path, args.region).to_string(index=False))
@@ -0,0 +1,366 @@
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import hashlib
+import multiprocessing
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from xml.etree import ElementTree
+
+from tracing import span, set_attributes
+
+# --- Streaming ingestion of uploaded literature ---
+# Pages are read one at a time, cut into passages and written straight into an
+# on-disk FTS5 index, so memory use does not grow with the number or size of
+# the uploads. Generation then pulls the best matching passages per topic.
+
+PASSAGE_SIZE = 1500
+PASSAGE_OVERLAP = 200
+TXT_BLOCK_SIZE = 64 * 1024
+INHERITABLE_PAGE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+INSERT_BATCH = 64
+
+OCR_CACHE_PATH = "ocr_cache.db"
+OCR_DPI = 200
+OCR_LANG = "deu+eng"
+OCR_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+STOPWORDS = {"teil", "und", "oder", "der", "die", "das", "in", "im", "von", "mit", "für", "zu", "den", "des"}
+
+
+# --- OCR fallback for scanned PDFs ---
+# Pages without a text layer are rasterized with PyMuPDF and read by Tesseract
+# in a process pool. Results are cached by the hash of the rendered page.
+_ocr_pool = None
+
+
+@lru_cache(maxsize=1)
+def ocr_available():
+    try:
+        import fitz  # noqa: F401
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return False
+    return True
+
+
+def _get_ocr_pool():
+    global _ocr_pool
+    if _ocr_pool is None:
+        # Forking the multithreaded Streamlit server can copy held locks into the
+        # children; spawned workers start from a clean interpreter
+        _ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _ocr_pool
+
+
+def _ocr_png(png):
+    # Runs in a worker process
+    import pytesseract
+    from PIL import Image
+
+    return pytesseract.image_to_string(Image.open(io.BytesIO(png)), lang=OCR_LANG)
+
+
+def _open_ocr_cache(path=OCR_CACHE_PATH):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS ocr_pages (digest TEXT PRIMARY KEY, text TEXT NOT NULL)")
+    return conn
+
+
+def new_ocr_stats():
+    # seconds: wall time with at least one page in the OCR pool
+    return {"pages": 0, "cached": 0, "seconds": 0.0}
+
+
+def ocr_report(stats):
+    if not stats["pages"]:
+        return ""
+    recognized = stats["pages"] - stats["cached"]
+    rate = f", {recognized / stats['seconds']:.1f} Seiten/s" if recognized and stats["seconds"] else ""
+    return f"{stats['pages']} gescannte Seiten per OCR gelesen ({stats['cached']} aus dem Cache{rate})"
+
+
+class _OcrClock:
+    """Union of the submit-to-result intervals of OCR futures, in submission order."""
+
+    def __init__(self):
+        self.total, self.start, self.end = 0.0, None, None
+
+    def submit(self, pool, png):
+        submitted = time.perf_counter()
+        future = pool.submit(_ocr_png, png)
+        future.submitted = submitted
+        # Record when the result arrives, not when the consumer gets round to it
+        future.add_done_callback(lambda f: setattr(f, "finished", time.perf_counter()))
+        return future
+
+    def add(self, future):
+        # result() can return just before the done callback has run
+        start, end = future.submitted, getattr(future, "finished", time.perf_counter())
+        if self.start is not None and start <= self.end:
+            self.end = max(self.end, end)
+            return
+        if self.start is not None:
+            self.total += self.end - self.start
+        self.start, self.end = start, end
+
+    def seconds(self):
+        return self.total + (self.end - self.start if self.start is not None else 0.0)
+
+
+def _pdf_bytes(file):
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+# --- Page generators ---
+def _iter_pdf_page_objects(reader):
+    """Pages in order, one at a time. reader.pages builds all page objects up front,
+    and PyPDF2 keeps every object it parsed; both grow with the page count."""
+    from PyPDF2 import PageObject
+
+    def walk(ref, inherited):
+        node = ref.get_object()
+        if "/Kids" in node:
+            inherited = {**inherited, **{k: node[k] for k in INHERITABLE_PAGE_KEYS if k in node}}
+            for kid in node["/Kids"]:
+                yield from walk(kid, inherited)
+        else:
+            page = PageObject(reader, ref if ref is not node else None)
+            page.update(inherited)
+            page.update(node)
+            yield page
+            # Content streams and fonts of pages already read are not needed again
+            resolved = getattr(reader, "resolved_objects", None)
+            if resolved is not None:
+                resolved.clear()
+
+    yield from walk(reader.trailer["/Root"].raw_get("/Pages"), {})
+
+
+def iter_pdf_pages(file, ocr=True, stats=None):
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file)
+    if not (ocr and ocr_available()):
+        for page in _iter_pdf_page_objects(reader):
+            text = page.extract_text()
+            if text:
+                yield text
+        return
+
+    import fitz
+
+    stats = stats if stats is not None else new_ocr_stats()
+    scan, cache, pool = None, None, None
+    # Pages in order: finished texts or OCR futures, at most a few pages ahead
+    window = deque()
+    clock = _OcrClock()
+
+    def drain(limit):
+        while window and (len(window) > limit or not hasattr(window[0][1], "result") or window[0][1].done()):
+            digest, item = window.popleft()
+            text = item.result() if hasattr(item, "result") else item
+            if hasattr(item, "result"):
+                clock.add(item)
+                with cache:
+                    cache.execute("INSERT OR REPLACE INTO ocr_pages (digest, text) VALUES (?, ?)", (digest, text))
+            if text and text.strip():
+                yield text
+
+    try:
+        for number, page in enumerate(_iter_pdf_page_objects(reader)):
+            text = page.extract_text()
+            if text and text.strip():
+                window.append((None, text))
+            else:
+                if scan is None:
+                    scan = fitz.open(stream=_pdf_bytes(file), filetype="pdf")
+                    cache = _open_ocr_cache()
+                    pool = _get_ocr_pool()
+                scanned = scan[number]
+                if not scanned.get_images():
+                    continue
+                png = scanned.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY).tobytes("png")
+                digest = hashlib.sha256(png).hexdigest()
+                stats["pages"] += 1
+                row = cache.execute("SELECT text FROM ocr_pages WHERE digest = ?", (digest,)).fetchone()
+                if row is not None:
+                    stats["cached"] += 1
+                    window.append((None, row[0]))
+                else:
+                    window.append((digest, clock.submit(pool, png)))
+            yield from drain(2 * OCR_WORKERS)
+        yield from drain(0)
+    finally:
+        stats["seconds"] += clock.seconds()
+        if scan is not None:
+            scan.close()
+            cache.close()
+
+
+def _docx_paragraph_text(paragraph):
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == W_NS + "t":
+            parts.append(node.text or "")
+        elif node.tag == W_NS + "tab":
+            parts.append("\t")
+        elif node.tag in (W_NS + "br", W_NS + "cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def iter_docx_pages(file):
+    # DOCX has no pages; yield blocks of paragraphs instead. word/document.xml is
+    # parsed incrementally (python-docx would load the whole tree), and finished
+    # body elements are dropped, so memory does not grow with the document.
+    block, size, depth, body = [], 0, 0, None
+    with zipfile.ZipFile(file) as archive, archive.open("word/document.xml") as xml:
+        for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if element.tag == W_NS + "body":
+                    body, body_depth = element, depth
+                continue
+            depth -= 1
+            if element.tag == W_NS + "p":
+                text = _docx_paragraph_text(element)
+                element.clear()
+                block.append(text)
+                size += len(text)
+                if size >= TXT_BLOCK_SIZE:
+                    yield "\n".join(block)
+                    block, size = [], 0
+            if body is not None and depth == body_depth:
+                # A paragraph or table directly in the body is done
+                body.clear()
+    if block:
+        yield "\n".join(block)
+
+
+def iter_txt_pages(file):
+    reader = io.TextIOWrapper(file, encoding="utf-8", errors="replace")
+    try:
+        while True:
+            block = reader.read(TXT_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+    finally:
+        # Leave the underlying upload open for Streamlit
+        reader.detach()
+
+
+def iter_pages(file, ocr_stats=None):
+    # Streamlit uploads carry a MIME type, files reopened from disk only a name
+    if getattr(file, "type", None) == "application/pdf" or file.name.endswith(".pdf"):
+        return iter_pdf_pages(file, stats=ocr_stats)
+    elif file.name.endswith(".docx"):
+        return iter_docx_pages(file)
+    else:
+        return iter_txt_pages(file)
+
+
+# --- Chunking ---
+def iter_passages(pages, size=PASSAGE_SIZE, overlap=PASSAGE_OVERLAP):
+    """Cut a stream of page texts into overlapping passages of about `size` chars."""
+    buffer = ""
+    for page in pages:
+        buffer = f"{buffer}\n{page}" if buffer else page
+        while len(buffer) >= size:
+            cut = buffer.rfind(" ", size - overlap, size)
+            if cut == -1:
+                cut = size
+            yield buffer[:cut].strip()
+            buffer = buffer[max(cut - overlap, 1):]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+# --- Passage index ---
+def open_passage_index(path=None):
+    """Open an FTS5 passage index; without a path a temporary file is used."""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="passages_", suffix=".db")
+        os.close(fd)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(doc UNINDEXED, text)")
+    return conn
+
+
+def index_passages(conn, doc_name, passages, batch_size=INSERT_BATCH):
+    """Write passages to the index in small batches. Returns the passage count."""
+    batch, count = [], 0
+    with conn:
+        for passage in passages:
+            batch.append((doc_name, passage))
+            if len(batch) >= batch_size:
+                conn.executemany("INSERT INTO passages (doc, text) VALUES (?, ?)", batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO passages (doc, text) VALUES (?, ?)", batch)
+            count += len(batch)
+    return count
+
+
+def ingest_files(conn, files, ocr_stats=None):
+    """Stream every uploaded file into the passage index."""
+    total = 0
+    for f in files:
+        name = os.path.basename(f.name)
+        with span("extract_text", doc=name, type=getattr(f, "type", None), bytes=getattr(f, "size", None)) as current:
+            count = index_passages(conn, name, iter_passages(iter_pages(f, ocr_stats)))
+            set_attributes(current, passages=count)
+        total += count
+    return total
+
+
+def _topic_query(topic):
+    terms = [t for t in re.findall(r"\w+", topic.lower()) if len(t) > 2 and t not in STOPWORDS and not t.isdigit()]
+    return " OR ".join('"' + t + '"' for t in terms)
+
+
+def select_context(conn, topic, max_chars=4000):
+    """Pick the passages that best match a topic, up to `max_chars` characters."""
+    rows = []
+    query = _topic_query(topic)
+    if query:
+        rows = conn.execute(
+            "SELECT text FROM passages WHERE passages MATCH ? ORDER BY rank LIMIT 20", (query,)
+        ).fetchall()
+    if not rows:
+        rows = conn.execute("SELECT text FROM passages ORDER BY rowid LIMIT 20").fetchall()
+
+    parts, size = [], 0
+    for (text,) in rows:
+        if size + len(text) > max_chars:
+            parts.append(text[:max_chars - size])
+            break
+        parts.append(text)
+        size += len(text) + 2
+    return "\n\n".join(parts)[:max_chars]
+
+
+def indexed_docs(conn):
+    """Names of the documents in the index, in upload order."""
+    rows = conn.execute("SELECT doc FROM passages GROUP BY doc ORDER BY MIN(rowid)")
+    return [doc for (doc,) in rows]
+
+
+def close_passage_index(conn):
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    conn.close()
+    if path and os.path.basename(path).startswith("passages_"):
+        os.remove(path)
+
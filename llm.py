@@ -0,0 +1,48 @@
+import json
+
+from metering import get_meter
+from tracing import span, set_attributes
+
+# --- Shared OpenAI access ---
+# All apps go through chat_completion() so every call is traced with its
+# latency, token usage and payload sizes, and metered against the budgets.
+
+
+def chat_completion(api_key, model, messages, usage=None, **kwargs):
+    """Call the chat API. `usage` attributes the cost: app, session, scenario, topic."""
+    # Imported on first call so the apps render before openai is loaded
+    import openai
+
+    usage = usage or {}
+    meter = get_meter()
+    requested_model = model
+    # Raises BudgetExceeded when no affordable model is left
+    model = meter.choose_model(model, usage.get("session"))
+
+    request_bytes = len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+    with span("openai.chat_completion", model=model, messages=len(messages),
+              request_bytes=request_bytes, max_tokens=kwargs.get("max_tokens")) as current:
+        if model != requested_model:
+            set_attributes(current, requested_model=requested_model)
+        # Per-request key: sessions run concurrently on threads of one process,
+        # so the module-global openai.api_key would leak between users
+        response = openai.ChatCompletion.create(model=model, messages=messages, api_key=api_key, **kwargs)
+        reply_bytes = sum(len((c.message.get("content") or "").encode("utf-8")) for c in response.choices)
+        counts = response.get("usage") or {}
+        # Rough estimate (4 bytes per token) if the API did not report usage
+        prompt_tokens = counts.get("prompt_tokens") or request_bytes // 4
+        completion_tokens = counts.get("completion_tokens") or reply_bytes // 4
+        cost = meter.record(
+            model, prompt_tokens, completion_tokens,
+            app=usage.get("app", ""), session=usage.get("session", ""),
+            scenario=usage.get("scenario", ""), topic=usage.get("topic", ""),
+        )
+        set_attributes(
+            current,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            response_bytes=reply_bytes,
+            cost_usd=round(cost, 6),
+        )
+    return response
@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# --- Concurrent-session load test ---
+# Starts the app with `streamlit run` (one server process) and a local
+# mock_llm_server.py, then drives N scripted browser sessions at once over
+# Streamlit's websocket protocol. For each N it reports throughput, tail
+# latency per interaction (request until the script run finishes) and the
+# server's resident memory.
+#
+#   python load_test.py Avtar.py --sessions 1,5,10,25 --turns 5 --latency-ms 800
+#
+# File uploads are not scripted, so test.py sessions exercise the key prompt
+# and exam assembly from the question bank.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+API_KEY = "sk-load-test"
+USER_MESSAGES = [
+    "Guten Tag, ich würde gern mit Ihnen über die Fortbildung sprechen.",
+    "Ich glaube, die Schule würde sehr von selbstgesteuertem Lernen profitieren.",
+    "Ich kann die Inhalte anschließend im Kollegium weitergeben.",
+    "Wie könnten wir die Vertretung während der Fortbildung organisieren?",
+    "Vielen Dank, auf Wiedersehen.",
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# --- Headless browser session ---
+class Session:
+    """One browser tab: keeps widget state and reruns the script like the frontend."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.ws = None
+        self.widgets = {}   # label -> widget id, from the last script run
+        self.states = {}    # widget id -> WidgetState for values that persist across runs
+        self.markdown = []
+
+    async def __aenter__(self):
+        # Declared in requirements.txt: tornado-based Streamlit releases do not pull it in
+        import websockets
+
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    async def rerun(self, trigger=None):
+        """Send a rerun request and wait for the script run to finish."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        for state in self.states.values():
+            message.rerun_script.widget_states.widgets.append(state)
+        if trigger is not None:
+            message.rerun_script.widget_states.widgets.append(WidgetState(id=trigger, trigger_value=True))
+
+        started = time.perf_counter()
+        await self.ws.send(message.SerializeToString())
+        self.widgets, self.markdown = {}, []
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(self.ws.recv(), self.timeout))
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                self._collect(forward.delta.new_element)
+            elif kind == "script_finished":
+                # An early finish means another rerun follows (st.rerun)
+                if forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return time.perf_counter() - started
+
+    def _collect(self, element):
+        kind = element.WhichOneof("type")
+        widget = getattr(element, kind)
+        if kind == "markdown":
+            self.markdown.append(widget.body)
+        elif getattr(widget, "id", "") and hasattr(widget, "label"):
+            self.widgets[widget.label] = widget.id
+
+    def find(self, label):
+        for widget_label, widget_id in self.widgets.items():
+            if widget_label.endswith(label):
+                return widget_id
+        raise LookupError(f"No widget labelled {label!r}")
+
+    def set_value(self, label, value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget_id = self.find(label)
+        self.states[widget_id] = WidgetState(id=widget_id, string_value=value)
+
+    async def click(self, label):
+        return await self.rerun(trigger=self.find(label))
+
+    def failed_replies(self):
+        # The chat apps render failed calls as "Error: ..." in the conversation
+        return sum("Error:" in body for body in self.markdown)
+
+
+async def run_chat_session(url, turns, timeout, latencies, errors):
+    async with Session(url, timeout) as session:
+        latencies.append(await session.rerun())
+        session.set_value(next(iter(session.widgets)), API_KEY)
+        latencies.append(await session.rerun())
+        failed = 0
+        for turn in range(turns):
+            session.set_value("(Teacher):", USER_MESSAGES[turn % len(USER_MESSAGES)])
+            latencies.append(await session.click("Send"))
+            if session.failed_replies() > failed:
+                failed = session.failed_replies()
+                errors.append("LLM call failed")
+
+
+async def run_exam_session(url, turns, timeout, latencies, errors):
+    async with Session(url, timeout) as session:
+        latencies.append(await session.rerun())
+        session.set_value("API-Schlüssel eingeben", API_KEY)
+        latencies.append(await session.rerun())
+        session.set_value("Quelle der Fragen", "Aus Fragenbank zusammenstellen")
+        latencies.append(await session.rerun())
+        for _ in range(turns):
+            latencies.append(await session.click("Fragen generieren"))
+
+
+async def run_level(url, server_pid, app, sessions, turns, timeout):
+    session = run_exam_session if os.path.basename(app) == "test.py" else run_chat_session
+    latencies, errors = [], []
+    peak_rss = rss_mb(server_pid) or 0.0
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, rss_mb(server_pid) or 0.0)
+            await asyncio.sleep(0.1)
+
+    async def one():
+        try:
+            await session(url, turns, timeout, latencies, errors)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    sampler = asyncio.create_task(sample_memory())
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    latencies.sort()
+    return {
+        "sessions": sessions,
+        "interactions": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "server_rss_mb": peak_rss or None,
+    }
+
+
+# --- Servers ---
+def _wait_for(url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args[:4])} exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_mock_server(args, port):
+    command = [
+        sys.executable, os.path.join(REPO_DIR, "mock_llm_server.py"), "--port", str(port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--tokens-per-second", str(args.tokens_per_second), "--error-rate", str(args.error_rate),
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _wait_for(f"http://127.0.0.1:{port}/stats", server)
+    return server
+
+
+def start_app_server(app, port, workdir, env):
+    command = [
+        sys.executable, "-m", "streamlit", "run", app,
+        "--server.headless", "true", "--server.port", str(port),
+        "--server.enableXsrfProtection", "false", "--browser.gatherUsageStats", "false",
+        "--server.fileWatcherType", "none",
+    ]
+    # Local databases and traces go to a scratch directory
+    server = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_for(f"http://127.0.0.1:{port}/_stcore/health", server)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test a Streamlit app with concurrent scripted sessions.")
+    parser.add_argument("app", help="entry point, e.g. Avtar.py or test.py")
+    parser.add_argument("--sessions", default="1,5,10", help="comma-separated session counts")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns or exam assemblies per session")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for one script run")
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    app = os.path.abspath(args.app)
+    levels = [int(n) for n in args.sessions.split(",")]
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    mock_port, app_port = _free_port(), _free_port()
+
+    env = dict(os.environ, OPENAI_API_BASE=f"http://127.0.0.1:{mock_port}/v1", TRACE_PATH="traces.jsonl")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_DIR, env.get("PYTHONPATH")]))
+
+    mock = start_mock_server(args, mock_port)
+    server = None
+    results = []
+    try:
+        server = start_app_server(app, app_port, workdir, env)
+        url = f"ws://127.0.0.1:{app_port}/_stcore/stream"
+        print(f"{'sessions':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'RSS MB':>8}")
+        for sessions in levels:
+            result = asyncio.run(run_level(url, server.pid, app, sessions, args.turns, args.timeout))
+            results.append(result)
+            rss = f"{result['server_rss_mb']:>8.0f}" if result["server_rss_mb"] else f"{'n/a':>8}"
+            print(f"{sessions:>8} {result['throughput']:>8.2f} {result['p50_ms']:>9.0f} {result['p95_ms']:>9.0f} "
+                  f"{result['p99_ms']:>9.0f} {result['errors']:>7} {rss}", flush=True)
+            if result["first_error"]:
+                print(f"         first error: {result['first_error']}")
+    finally:
+        for process in (server, mock):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"app": args.app, "turns": args.turns, "results": results}, f, indent=2)
+    print(f"Server working directory (databases, traces): {workdir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+# --- Token and cost metering ---
+# Every LLM call is recorded with its prompt/completion tokens and cost, per
+# app, session, scenario and topic. Rollup tables are updated on each call, so
+# budget checks and usage reports never scan the raw log.
+#
+#   METER_DB_PATH=usage.db
+#   METER_SESSION_BUDGET_USD=1.00   per session (chat session or exam job)
+#   METER_DAILY_BUDGET_USD=25.00    for all apps together
+#
+# Over budget, calls degrade to a cheaper model where one exists; past
+# HARD_LIMIT_FACTOR x budget (or without a cheaper model) they are refused.
+#
+#   python metering.py report --by day,app,model
+#   python metering.py report --by session --since 2025-01-01
+
+DB_PATH = os.environ.get("METER_DB_PATH", "usage.db")
+SESSION_BUDGET_USD = float(os.environ.get("METER_SESSION_BUDGET_USD", 1.0))
+DAILY_BUDGET_USD = float(os.environ.get("METER_DAILY_BUDGET_USD", 25.0))
+HARD_LIMIT_FACTOR = 1.5
+
+# USD per 1K tokens (prompt, completion)
+PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+}
+CHEAPER_MODEL = {
+    "gpt-4": "gpt-4o-mini",
+    "gpt-4o": "gpt-4o-mini",
+}
+
+REPORT_COLUMNS = ("day", "app", "session", "scenario", "topic", "model")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    app TEXT NOT NULL,
+    session TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost_usd REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage_rollup (
+    day TEXT NOT NULL,
+    app TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost_usd REAL NOT NULL,
+    PRIMARY KEY (day, app, scenario, topic, model)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_spend (
+    session TEXT NOT NULL,
+    day TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost_usd REAL NOT NULL,
+    PRIMARY KEY (session, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_spend (
+    day TEXT PRIMARY KEY,
+    calls INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    cost_usd REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def cost_usd(model, prompt_tokens, completion_tokens):
+    # Dated snapshots (e.g. gpt-4o-mini-2024-07-18) use the base model's price
+    base = max((m for m in PRICES if model.startswith(m)), key=len, default=None)
+    prompt_price, completion_price = PRICES.get(base, PRICES["gpt-4"])
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+def _today():
+    return datetime.date.today().isoformat()
+
+
+class Meter:
+    def __init__(self, path=DB_PATH, session_budget=SESSION_BUDGET_USD, daily_budget=DAILY_BUDGET_USD):
+        self.path = path
+        self.session_budget = session_budget
+        self.daily_budget = daily_budget
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def spent(self, session=None, day=None):
+        """(session cost, daily cost) in USD from the rollup tables."""
+        conn = self._conn()
+        (session_cost,) = conn.execute(
+            "SELECT COALESCE(SUM(cost_usd), 0.0) FROM session_spend WHERE session = ?", (session or "",)
+        ).fetchone()
+        row = conn.execute("SELECT cost_usd FROM daily_spend WHERE day = ?", (day or _today(),)).fetchone()
+        return session_cost, (row[0] if row else 0.0)
+
+    def choose_model(self, model, session=None):
+        """The model to call under the current budgets, or BudgetExceeded."""
+        session_cost, daily_cost = self.spent(session)
+        over = []
+        if session and session_cost >= self.session_budget:
+            over.append(("Sitzungsbudget / session budget", session_cost, self.session_budget))
+        if daily_cost >= self.daily_budget:
+            over.append(("Tagesbudget / daily budget", daily_cost, self.daily_budget))
+        if not over:
+            return model
+
+        name, cost, budget = over[0]
+        cheaper = CHEAPER_MODEL.get(model)
+        if cheaper and all(c < b * HARD_LIMIT_FACTOR for _, c, b in over):
+            return cheaper
+        raise BudgetExceeded(f"{name} erschöpft / exhausted: {cost:.3f} of {budget:.3f} USD")
+
+    def record(self, model, prompt_tokens, completion_tokens, app="", session="", scenario="", topic=""):
+        cost = cost_usd(model, prompt_tokens, completion_tokens)
+        tokens = prompt_tokens + completion_tokens
+        now, day = time.time(), _today()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (now, day, app, session, scenario, topic, model, prompt_tokens, completion_tokens, cost),
+            )
+            conn.execute(
+                "INSERT INTO usage_rollup VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?) "
+                "ON CONFLICT (day, app, scenario, topic, model) DO UPDATE SET calls = calls + 1, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "cost_usd = cost_usd + excluded.cost_usd",
+                (day, app, scenario, topic, model, prompt_tokens, completion_tokens, cost),
+            )
+            conn.execute(
+                "INSERT INTO session_spend VALUES (?, ?, 1, ?, ?, ?) ON CONFLICT (session, day) DO UPDATE SET "
+                "calls = calls + 1, prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                "cost_usd = cost_usd + excluded.cost_usd",
+                (session, day, prompt_tokens, completion_tokens, cost),
+            )
+            conn.execute(
+                "INSERT INTO daily_spend VALUES (?, 1, ?, ?) ON CONFLICT (day) DO UPDATE SET "
+                "calls = calls + 1, tokens = tokens + excluded.tokens, cost_usd = cost_usd + excluded.cost_usd",
+                (day, tokens, cost),
+            )
+        return cost
+
+    def report(self, by=("day", "app", "model"), since=None):
+        """Aggregated usage grouped by any of REPORT_COLUMNS."""
+        unknown = [c for c in by if c not in REPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown report columns: {', '.join(unknown)}")
+        by = list(by)
+        columns = ", ".join(by) or "'all'"
+        if "session" in by and set(by) <= {"session", "day"}:
+            source, calls = "session_spend", "SUM(calls)"
+        elif "session" in by:
+            # Sessions are rolled up per day only; finer splits read the call log
+            source, calls = "usage", "COUNT(*)"
+        else:
+            source, calls = "usage_rollup", "SUM(calls)"
+        sql = (
+            f"SELECT {columns}, {calls}, SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd) "
+            f"FROM {source}"
+        )
+        params = []
+        if since:
+            sql += " WHERE day >= ?"
+            params.append(since)
+        sql += f" GROUP BY {columns} ORDER BY {columns}"
+        keys = by or ["all"]
+        return [
+            dict(zip(keys + ["calls", "prompt_tokens", "completion_tokens", "cost_usd"], row))
+            for row in self._conn().execute(sql, params)
+        ]
+
+
+_meter = None
+_meter_lock = threading.Lock()
+
+
+def get_meter():
+    global _meter
+    with _meter_lock:
+        if _meter is None:
+            _meter = Meter()
+        return _meter
+
+
+def _report_columns(value):
+    columns = [c.strip() for c in value.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in REPORT_COLUMNS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"invalid choice: {', '.join(unknown)} (choose from {', '.join(REPORT_COLUMNS)})"
+        )
+    return columns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LLM usage report.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--by", type=_report_columns, default="day,app,model",
+                        help=f"comma-separated, from {', '.join(REPORT_COLUMNS)}")
+    parser.add_argument("--since", help="first day to include (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    rows = get_meter().report(args.by, args.since)
+    if not rows:
+        print("No usage recorded.")
+        return 0
+    keys = list(rows[0])
+    print("\t".join(keys))
+    for row in rows:
+        print("\t".join(f"{v:.4f}" if isinstance(v, float) else str(v) for v in row.values()))
+    total = sum(r["cost_usd"] for r in rows)
+    print(f"Total: {sum(r['calls'] for r in rows)} calls, {total:.4f} USD")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,184 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- OpenAI-compatible mock server for load tests ---
+# Serves POST /v1/chat/completions with configurable latency, streaming and
+# error rates, so the apps can be exercised without paying for real calls.
+# Point the apps at it with OPENAI_API_BASE=http://127.0.0.1:<port>/v1
+#
+#   python mock_llm_server.py --port 8765 --latency-ms 800 --error-rate 0.02
+
+CHAT_REPLY = (
+    "Vielen Dank für Ihr Anliegen. Ich verstehe Ihre Sicht, möchte aber zunächst "
+    "genauer wissen, welchen Nutzen Sie für unsere Schule sehen."
+)
+
+EXAM_REPLY = json.dumps([
+    {
+        "frage": f"Mock-Frage {i}: Erläutern Sie einen zentralen Aspekt des Themas anhand eines Beispiels.",
+        "optionen": [],
+        "antwort": "",
+    }
+    for i in range(1, 9)
+], ensure_ascii=False)
+
+
+class MockConfig:
+    def __init__(self, latency_ms=500, jitter_ms=200, tokens_per_second=60, error_rate=0.0, error_status=500, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def first_token_delay(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+
+def _count_tokens(text):
+    # Rough estimate, good enough for usage numbers in a mock
+    return max(1, len(text) // 4)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = MockConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, {"requests": self.config.requests, "errors": self.config.errors})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        config = self.config
+        time.sleep(config.first_token_delay())
+        if config.should_fail():
+            kind = "rate_limit_error" if config.error_status == 429 else "server_error"
+            self._send_json(config.error_status, {"error": {"message": "Mock failure", "type": kind}})
+            return
+
+        model = request.get("model", "gpt-4o-mini")
+        prompt = json.dumps(request.get("messages", []), ensure_ascii=False)
+        content = EXAM_REPLY if model.startswith("gpt-4") and model != "gpt-4o-mini" else CHAT_REPLY
+        usage = {
+            "prompt_tokens": _count_tokens(prompt),
+            "completion_tokens": _count_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+        if request.get("stream"):
+            self._stream(completion_id, model, content)
+            return
+
+        # Simulate generation time for the whole completion
+        if config.tokens_per_second:
+            time.sleep(usage["completion_tokens"] / config.tokens_per_second)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, completion_id, model, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        words = content.split(" ")
+        delay = 1 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+        for i, word in enumerate(words):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(delay)
+        done = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def make_server(port=0, host="127.0.0.1", **config):
+    """Create a mock server; port 0 picks a free port (see server.server_port)."""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"config": MockConfig(**config)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=500, help="mean time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=60, help="0 returns completions instantly")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, choices=[429, 500, 503])
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    server = make_server(
+        args.port, args.host, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+        error_status=args.error_status, seed=args.seed,
+    )
+    print(f"Mock OpenAI server on http://{args.host}:{server.server_port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
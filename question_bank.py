@@ -0,0 +1,240 @@
+import json
+import re
+import sqlite3
+import hashlib
+
+# --- Persistent question bank (SQLite + FTS5) ---
+# Questions generated in test.py are parsed into records and stored here, so
+# exams can be assembled from existing questions instead of new gpt-4 calls.
+
+DB_PATH = "question_bank.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    digest TEXT UNIQUE NOT NULL,
+    stem TEXT NOT NULL,
+    options TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    format TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created TEXT NOT NULL DEFAULT (datetime('now'))
+);
+CREATE INDEX IF NOT EXISTS idx_questions_topic_format ON questions (topic, format);
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    stem, options, content='questions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS questions_ai AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts (rowid, stem, options)
+    VALUES (new.id, new.stem, new.options);
+END;
+CREATE TRIGGER IF NOT EXISTS questions_ad AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts (questions_fts, rowid, stem, options)
+    VALUES ('delete', old.id, old.stem, old.options);
+END;
+"""
+
+# Formats as offered in the test.py selectbox (minus "Gemischt")
+FORMAT_OPEN = "Offene Fragen"
+FORMAT_MC = "Multiple Choice"
+FORMAT_CASE = "Fallbasiert"
+
+OPTION_RE = re.compile(r"^\s*(?:\(?([A-Da-d])[\).:]|[-•]\s*([A-Da-d])\))\s*(.+)$")
+ANSWER_RE = re.compile(r"^\s*\**\s*(?:richtige antwort|korrekte antwort|lösung|antwort|answer)\s*\**\s*[:：]\s*\**\s*(.+?)\**\s*$", re.IGNORECASE)
+INLINE_OPTION_RE = re.compile(r"\s+(?=\(?[A-Da-d][\).:]\s)")
+JSON_ARRAY_RE = re.compile(r"\[\s*\{")
+NUMBER_RE = re.compile(r"^\s*(?:\*\*)?\s*(?:frage\s*)?\d+[\).:]\s*(?:\*\*)?\s*", re.IGNORECASE)
+
+
+def open_bank(path=DB_PATH):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# --- Parsing of model output ---
+def _detect_format(stem, options, requested_format):
+    if options:
+        return FORMAT_MC
+    if requested_format in (FORMAT_OPEN, FORMAT_MC, FORMAT_CASE):
+        return requested_format
+    if re.search(r"\b(fall\w*|\w*situation\w*|vignette\w*)\b", stem, re.IGNORECASE):
+        return FORMAT_CASE
+    return FORMAT_OPEN
+
+
+def _record(stem, options, answer, topic, requested_format, source):
+    stem = NUMBER_RE.sub("", stem.strip(), count=1).strip()
+    return {
+        "stem": stem,
+        "options": [o.strip() for o in options if o and o.strip()],
+        "answer": (answer or "").strip(),
+        "topic": topic,
+        "format": _detect_format(stem, options, requested_format),
+        "source": source,
+    }
+
+
+def _looks_like_json(raw):
+    text = raw.lstrip()
+    return text.startswith(("[", "```")) or JSON_ARRAY_RE.search(raw) is not None
+
+
+def _parse_json(raw):
+    # The model is asked for a JSON array, but may wrap it in prose or a code fence
+    start, end = raw.find("["), raw.rfind("]")
+    if start == -1:
+        return None
+    if end > start:
+        try:
+            data = json.loads(raw[start:end + 1])
+            if isinstance(data, list) and all(isinstance(d, dict) for d in data):
+                return data
+        except ValueError:
+            pass
+
+    # Cut off at max_tokens: keep the objects that were completed
+    decoder, data, pos = json.JSONDecoder(), [], start + 1
+    while True:
+        while pos < len(raw) and raw[pos] in " \t\r\n,":
+            pos += 1
+        try:
+            item, pos = decoder.raw_decode(raw, pos)
+        except ValueError:
+            break
+        if not isinstance(item, dict):
+            break
+        data.append(item)
+    return data or None
+
+
+def _option_text(option):
+    # Items often repeat their label ("A) ..."); format_question adds its own
+    text = str(option)
+    match = OPTION_RE.match(text)
+    return match.group(3) if match else text
+
+
+def _parse_options(options):
+    if isinstance(options, dict):
+        # {"A": "...", "B": "..."}: the keys are the labels
+        options = list(options.values())
+    if isinstance(options, list):
+        return [_option_text(o) for o in options]
+    if isinstance(options, str):
+        # "A) x B) y" on one line: put every option on its own line for OPTION_RE
+        _, parsed, _ = _parse_block(INLINE_OPTION_RE.sub("\n", options))
+        return parsed
+    return []
+
+
+def _parse_block(block):
+    stem_lines, options, answer = [], [], ""
+    for line in block.splitlines():
+        answer_match = ANSWER_RE.match(line)
+        option_match = OPTION_RE.match(line)
+        if answer_match:
+            answer = answer_match.group(1)
+        elif option_match:
+            options.append(option_match.group(3))
+        elif line.strip():
+            stem_lines.append(line.strip())
+    return " ".join(stem_lines), options, answer
+
+
+def parse_questions(raw, topic, requested_format="", source=""):
+    """Turn a model response into question records (stem, options, answer, ...)."""
+    records = []
+    if _looks_like_json(raw):
+        # Never block-parse JSON: a truncated array would become one bogus question
+        data = _parse_json(raw)
+        if data is None:
+            raise ValueError("Antwort ist kein gültiges JSON-Array / reply is not a valid JSON array")
+        for item in data:
+            stem = str(item.get("frage") or item.get("stem") or "")
+            options = _parse_options(item.get("optionen") or item.get("options") or [])
+            answer = item.get("antwort") or item.get("answer") or ""
+            if len(stem.strip()) > 20:
+                records.append(_record(stem, options, str(answer), topic, requested_format, source))
+        return records
+
+    # Fallback: blank-line separated blocks, options and answers on their own lines
+    for block in raw.strip().split("\n\n"):
+        stem, options, answer = _parse_block(block)
+        if not stem and options and records:
+            # Options separated from their stem by a blank line
+            records[-1]["options"].extend(options)
+            records[-1]["format"] = FORMAT_MC
+            records[-1]["answer"] = records[-1]["answer"] or answer.strip()
+            continue
+        if len(stem) > 20:
+            records.append(_record(stem, options, answer, topic, requested_format, source))
+    return records
+
+
+def format_question(record):
+    lines = [record["stem"]]
+    for letter, option in zip("ABCDEFGH", record["options"]):
+        lines.append(f"{letter}) {option}")
+    if record["answer"]:
+        lines.append(f"Richtige Antwort: {record['answer']}")
+    return "\n".join(lines)
+
+
+# --- Storage and retrieval ---
+def _digest(record):
+    key = "\x1f".join([record["topic"], record["stem"].lower(), "|".join(record["options"])])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def add_questions(conn, records):
+    """Insert records, skipping exact duplicates. Returns the number of new rows."""
+    rows = [
+        (_digest(r), r["stem"], json.dumps(r["options"], ensure_ascii=False), r["answer"],
+         r["topic"], r["format"], r["source"])
+        for r in records
+    ]
+    with conn:
+        cursor = conn.executemany(
+            "INSERT OR IGNORE INTO questions (digest, stem, options, answer, topic, format, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return max(cursor.rowcount, 0)
+
+
+def _fts_query(text):
+    # Quote each term so user input cannot break the FTS5 query syntax
+    terms = re.findall(r"\w+", text)
+    return " ".join('"' + t + '"' for t in terms)
+
+
+def find_questions(conn, topic=None, question_format=None, query=None, limit=50, random_order=False):
+    """Query the bank by topic, format and optional full-text search."""
+    sql = "SELECT q.* FROM questions q"
+    where, params = [], []
+    if query and _fts_query(query):
+        sql += " JOIN questions_fts f ON f.rowid = q.id"
+        where.append("questions_fts MATCH ?")
+        params.append(_fts_query(query))
+    if topic:
+        where.append("q.topic = ?")
+        params.append(topic)
+    if question_format:
+        where.append("q.format = ?")
+        params.append(question_format)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY random()" if random_order else " ORDER BY q.id"
+    sql += " LIMIT ?"
+    params.append(limit)
+
+    records = []
+    for row in conn.execute(sql, params):
+        record = dict(row)
+        record["options"] = json.loads(record["options"])
+        records.append(record)
+    return records
+
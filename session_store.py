@@ -0,0 +1,421 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from urllib.parse import urlparse
+
+# --- Externalized chat session state ---
+# Conversations are kept in a shared backend instead of one process's
+# st.session_state, so several Streamlit replicas can serve the same session
+# and a restart does not drop active role-plays. Only new messages are
+# written on each turn.
+#
+#   SESSION_BACKEND=memory | sqlite (default) | redis
+#   SESSION_SQLITE_PATH=sessions.db
+#   SESSION_REDIS_URL=redis://127.0.0.1:6379/0
+#   SESSION_TTL_SECONDS=604800
+#
+# `python session_store.py serve --port 6379` runs a small Redis-protocol
+# stand-in for local multi-process setups without a Redis installation.
+
+SQLITE_PATH = os.environ.get("SESSION_SQLITE_PATH", "sessions.db")
+REDIS_URL = os.environ.get("SESSION_REDIS_URL", "redis://127.0.0.1:6379/0")
+TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", 7 * 24 * 3600))
+COMPRESS_ABOVE = 256
+
+ROLE_CODES = {"system": "s", "user": "u", "assistant": "a"}
+CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+
+# --- Compact message encoding ---
+def encode_message(message):
+    role = ROLE_CODES.get(message["role"], message["role"])
+    data = json.dumps([role, message["content"]], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(data) > COMPRESS_ABOVE:
+        packed = zlib.compress(data, 6)
+        if len(packed) < len(data):
+            return b"z" + packed
+    return b"j" + data
+
+
+def decode_message(blob):
+    data = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    role, content = json.loads(data)
+    return {"role": CODE_ROLES.get(role, role), "content": content}
+
+
+# --- Backends ---
+class MemoryStore:
+    """Per-process store; state is lost on restart (the previous behaviour)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def load(self, session_id):
+        with self._lock:
+            return [decode_message(b) for b in self._sessions.get(session_id, [])]
+
+    def append(self, session_id, messages):
+        encoded = [encode_message(m) for m in messages]
+        with self._lock:
+            self._sessions.setdefault(session_id, []).extend(encoded)
+
+    def replace(self, session_id, messages):
+        encoded = [encode_message(m) for m in messages]
+        with self._lock:
+            self._sessions[session_id] = encoded
+
+
+class SQLiteStore:
+    """Shared by all processes on one host; survives restarts."""
+
+    def __init__(self, path=SQLITE_PATH, ttl=TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_messages ("
+                " session TEXT NOT NULL, seq INTEGER NOT NULL, data BLOB NOT NULL, written REAL NOT NULL,"
+                " PRIMARY KEY (session, seq)) WITHOUT ROWID"
+            )
+            # Drop whole sessions that have been idle for longer than the TTL
+            conn.execute(
+                "DELETE FROM session_messages WHERE session IN ("
+                " SELECT session FROM session_messages GROUP BY session HAVING MAX(written) < ?)",
+                (time.time() - self.ttl,),
+            )
+
+    def _conn(self):
+        # Streamlit runs sessions on separate threads; one connection per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id):
+        rows = self._conn().execute(
+            "SELECT data FROM session_messages WHERE session = ? ORDER BY seq", (session_id,)
+        )
+        return [decode_message(data) for (data,) in rows]
+
+    def append(self, session_id, messages):
+        now = time.time()
+        with self._conn() as conn:
+            # seq is computed by the INSERT itself, which holds the write lock, so
+            # two processes appending to the same session cannot pick the same one
+            conn.executemany(
+                "INSERT INTO session_messages (session, seq, data, written) "
+                "SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ? FROM session_messages WHERE session = ?",
+                [(session_id, encode_message(m), now, session_id) for m in messages],
+            )
+
+    def replace(self, session_id, messages):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("DELETE FROM session_messages WHERE session = ?", (session_id,))
+            conn.executemany(
+                "INSERT INTO session_messages (session, seq, data, written) VALUES (?, ?, ?, ?)",
+                [(session_id, i, encode_message(m), now) for i, m in enumerate(messages)],
+            )
+
+
+class RedisStore:
+    """Shared across hosts through any Redis-protocol server (one list per session)."""
+
+    def __init__(self, url=REDIS_URL, ttl=TTL_SECONDS):
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or "127.0.0.1", parsed.port or 6379)
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _key(self, session_id):
+        return f"conversation:{session_id}".encode()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = RespClient(self.address)
+            if self.password:
+                client.execute(b"AUTH", self.password.encode())
+            if self.db:
+                client.execute(b"SELECT", str(self.db).encode())
+            self._local.client = client
+        return client
+
+    def _pipeline(self, *commands):
+        try:
+            return self._client().pipeline(commands)
+        except OSError:
+            # Reconnect once, e.g. after the server restarted
+            self._local.client = None
+            return self._client().pipeline(commands)
+
+    def load(self, session_id):
+        (items,) = self._pipeline((b"LRANGE", self._key(session_id), b"0", b"-1"))
+        return [decode_message(item) for item in items]
+
+    def append(self, session_id, messages):
+        key = self._key(session_id)
+        self._pipeline(
+            (b"RPUSH", key, *[encode_message(m) for m in messages]),
+            (b"EXPIRE", key, str(self.ttl).encode()),
+        )
+
+    def replace(self, session_id, messages):
+        key = self._key(session_id)
+        self._pipeline(
+            (b"DEL", key),
+            (b"RPUSH", key, *[encode_message(m) for m in messages]),
+            (b"EXPIRE", key, str(self.ttl).encode()),
+        )
+
+
+# --- Minimal RESP (Redis protocol) client ---
+class RespError(Exception):
+    pass
+
+
+def _encode_command(args):
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed by server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest
+    if kind == b"-":
+        return RespError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        size = int(rest)
+        if size == -1:
+            return None
+        data = reader.read(size + 2)
+        if len(data) < size + 2:
+            raise ConnectionError("Connection closed in the middle of a reply")
+        return data[:-2]
+    if kind == b"*":
+        count = int(rest)
+        return None if count == -1 else [_read_reply(reader) for _ in range(count)]
+    raise RespError(f"Unexpected reply {line!r}")
+
+
+class RespClient:
+    def __init__(self, address, timeout=10):
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.reader = self.sock.makefile("rb")
+
+    def pipeline(self, commands):
+        """Send several commands in one round trip and return their replies."""
+        self.sock.sendall(b"".join(_encode_command(c) for c in commands))
+        replies = [_read_reply(self.reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+
+# --- Streamlit integration ---
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide store selected by SESSION_BACKEND."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.environ.get("SESSION_BACKEND", "sqlite")
+            if backend == "memory":
+                _store = MemoryStore()
+            elif backend == "redis":
+                _store = RedisStore()
+            elif backend == "sqlite":
+                _store = SQLiteStore()
+            else:
+                raise ValueError(f"Unknown SESSION_BACKEND {backend!r}")
+        return _store
+
+
+def session_id():
+    """Stable id for this browser session, kept in the ?sid= query parameter."""
+    import streamlit as st
+
+    sid = st.session_state.get("session_id") or st.query_params.get("sid") or uuid.uuid4().hex
+    st.session_state.session_id = sid
+    if st.query_params.get("sid") != sid:
+        st.query_params["sid"] = sid
+    return sid
+
+
+def restore_conversation(initial):
+    """Load st.session_state.conversation from the store, or start it with `initial`."""
+    import streamlit as st
+
+    if "conversation" in st.session_state:
+        return
+    store, sid = get_store(), session_id()
+    conversation = store.load(sid)
+    if not conversation:
+        conversation = list(initial)
+        store.replace(sid, conversation)
+    st.session_state.conversation = conversation
+    st.session_state.conversation_saved = len(conversation)
+
+
+def persist_conversation():
+    """Write the messages added since the last save."""
+    import streamlit as st
+
+    conversation = st.session_state.conversation
+    saved = st.session_state.get("conversation_saved", 0)
+    if len(conversation) > saved:
+        get_store().append(session_id(), conversation[saved:])
+        st.session_state.conversation_saved = len(conversation)
+
+
+def reset_conversation(initial):
+    import streamlit as st
+
+    st.session_state.conversation = list(initial)
+    get_store().replace(session_id(), st.session_state.conversation)
+    st.session_state.conversation_saved = len(st.session_state.conversation)
+
+
+# --- Redis-protocol stand-in: python session_store.py serve ---
+class StandInServer:
+    """Single-file RESP server with the list commands used above.
+
+    Writes are appended to an append-only file and replayed on start, so
+    sessions also survive a restart of the stand-in itself.
+    """
+
+    def __init__(self, aof_path=None):
+        self.lists = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+        self.aof = None
+        if aof_path:
+            if os.path.exists(aof_path):
+                self._replay(aof_path)
+            self.aof = open(aof_path, "ab")
+
+    def _replay(self, path):
+        with open(path, "r+b") as f:
+            end = 0
+            while True:
+                try:
+                    command = _read_reply(f)
+                except (ConnectionError, ValueError):
+                    break
+                self.apply(command, log=False)
+                end = f.tell()
+            # Drop a command torn by a crash, so new writes do not follow garbage
+            f.truncate(end)
+
+    def _expired(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline < time.time():
+            self.lists.pop(key, None)
+            self.expires.pop(key, None)
+
+    def apply(self, command, log=True):
+        name = command[0].upper()
+        with self.lock:
+            if len(command) > 1:
+                self._expired(command[1])
+            if name == b"PING":
+                return b"+PONG\r\n"
+            if name in (b"SELECT", b"AUTH"):
+                return b"+OK\r\n"
+            if name == b"LRANGE":
+                items = self.lists.get(command[1], [])
+                start, stop = int(command[2]), int(command[3])
+                stop = len(items) if stop == -1 else stop + 1
+                selected = items[start:stop]
+                return b"*%d\r\n" % len(selected) + b"".join(b"$%d\r\n%s\r\n" % (len(i), i) for i in selected)
+            if name == b"LLEN":
+                return b":%d\r\n" % len(self.lists.get(command[1], []))
+            if name == b"RPUSH":
+                items = self.lists.setdefault(command[1], [])
+                items.extend(command[2:])
+                reply = b":%d\r\n" % len(items)
+            elif name == b"DEL":
+                removed = sum(self.lists.pop(key, None) is not None for key in command[1:])
+                for key in command[1:]:
+                    self.expires.pop(key, None)
+                reply = b":%d\r\n" % removed
+            elif name == b"EXPIRE":
+                if command[1] not in self.lists:
+                    return b":0\r\n"
+                # Stored as an absolute deadline so replays keep the original expiry
+                self.expires[command[1]] = time.time() + int(command[2])
+                command = [b"EXPIREAT", command[1], str(int(self.expires[command[1]])).encode()]
+                reply = b":1\r\n"
+            elif name == b"EXPIREAT":
+                self.expires[command[1]] = int(command[2])
+                reply = b":1\r\n"
+            else:
+                return b"-ERR unknown command '%s'\r\n" % command[0]
+            if log and self.aof is not None:
+                self.aof.write(_encode_command(command))
+                self.aof.flush()
+            return reply
+
+    def handle(self, conn):
+        reader = conn.makefile("rb")
+        try:
+            while True:
+                try:
+                    command = _read_reply(reader)
+                except ConnectionError:
+                    return
+                if not isinstance(command, list) or not command:
+                    conn.sendall(b"-ERR protocol error\r\n")
+                    return
+                conn.sendall(self.apply(command))
+        finally:
+            conn.close()
+
+    def serve(self, host="127.0.0.1", port=6379):
+        server = socket.create_server((host, port), reuse_port=False)
+        print(f"Redis-protocol stand-in on {host}:{port}", flush=True)
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Redis-protocol stand-in for the session store.")
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--aof", default="sessions.aof", help="append-only file ('' keeps data in memory only)")
+    args = parser.parse_args()
+    try:
+        StandInServer(args.aof or None).serve(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# --- Startup profiler for the Streamlit entry points ---
+# Each app is run once, headlessly, in a fresh interpreter via Streamlit's
+# AppTest. We report time-to-first-render (first full script run) and the
+# modules the script imported on the way, using `python -X importtime`.
+#
+#   python startup_profile.py                # all entry points, default budget
+#   python startup_profile.py test.py --budget 1.5
+#
+# Exits with status 1 if any cold start exceeds the budget.
+
+ENTRY_POINTS = ["climate_app.py", "test.py", "demo.py", "Avtar.py", "Exam.py", "avatat copy.py"]
+BUDGET_SECONDS = 3.0
+MARKER = "--- app start ---"
+
+
+def _child(path):
+    from streamlit.testing.v1 import AppTest
+
+    # Imports before the marker belong to Streamlit itself, not to the app
+    print(MARKER, file=sys.stderr, flush=True)
+    started = time.perf_counter()
+    app = AppTest.from_file(path, default_timeout=120)
+    app.run()
+    elapsed = time.perf_counter() - started
+    errors = [e.value for e in app.exception]
+    print(json.dumps({"first_render": elapsed, "errors": errors}))
+
+
+def _parse_importtime(stderr):
+    """Top-level imports (cumulative microseconds) made after the marker."""
+    imports = {}
+    seen_marker = False
+    for line in stderr.splitlines():
+        if line.strip() == MARKER:
+            seen_marker = True
+            continue
+        if not seen_marker or not line.startswith("import time:"):
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            cumulative = int(cumulative)
+        except ValueError:
+            continue
+        # Nested imports are indented under their parent
+        if not name.startswith("  "):
+            imports[name.strip()] = imports.get(name.strip(), 0) + cumulative
+    return imports
+
+
+def profile_entry_point(path):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", path],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(path)) or ".",
+    )
+    try:
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        tail = result.stderr.strip().splitlines()[-1:] or ["no output"]
+        report = {"first_render": None, "errors": [tail[0]]}
+    imports = _parse_importtime(result.stderr)
+    report["import_seconds"] = sum(imports.values()) / 1e6
+    report["top_imports"] = sorted(imports.items(), key=lambda kv: kv[1], reverse=True)[:5]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold start of the Streamlit apps.")
+    parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="max seconds to first render")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child)
+        return 0
+
+    failed = []
+    for path in args.entry_points:
+        report = profile_entry_point(path)
+        first_render = report["first_render"]
+        shown = f"{first_render:.2f}s" if first_render is not None else "n/a"
+        print(f"{path}: first render {shown}, app imports {report['import_seconds']:.2f}s")
+        for name, micros in report["top_imports"]:
+            print(f"    {micros / 1000:8.1f} ms  {name}")
+        for error in report["errors"]:
+            print(f"    error: {error}")
+        if first_render is None or first_render > args.budget:
+            failed.append(path)
+
+    if failed:
+        print(f"Cold start over budget ({args.budget:.1f}s): {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
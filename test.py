@@ -1,8 +1,9 @@
 import streamlit as st
-import openai
-from PyPDF2 import PdfReader
-from docx import Document
 import datetime
+import time
+from question_bank import open_bank, find_questions, format_question
+from exam_jobs import open_queue, submit_job, job_progress, recent_jobs, start_worker
+from tracing import render_debug_panel
 
 # --- Streamlit page configuration ---
 st.set_page_config(page_title="EQF 6–7 Fragen-Generator (Deutsch)", layout="wide")
@@ -10,34 +11,10 @@ st.title("🎓 EQF 6–7 Fragen-Generator für Lehrerbildung (Deutsch)")
 
 # --- OpenAI API Key ---
 api_key = st.text_input("🔑 OpenAI API-Schlüssel eingeben", type="password")
-if api_key:
-    openai.api_key = api_key
-else:
+if not api_key:
     st.warning("Bitte API-Schlüssel eingeben, um fortzufahren.")
     st.stop()
 
-# --- File reading functions ---
-def extract_text_from_pdf(file):
-    reader = PdfReader(file)
-    texts = []
-    for page in reader.pages:
-        text = page.extract_text()
-        if text:
-            texts.append(text)
-    return "\n".join(texts)
-
-def extract_text_from_docx(file):
-    doc = Document(file)
-    return "\n".join([para.text for para in doc.paragraphs])
-
-def extract_text(file):
-    if file.type == "application/pdf":
-        return extract_text_from_pdf(file)
-    elif file.name.endswith(".docx"):
-        return extract_text_from_docx(file)
-    else:
-        return file.read().decode("utf-8")
-
 # --- Topic and format configuration ---
 topics = {
     "Teil 1: Arbeiten in multiprofessionellen Teams / Ganztagsschule": 8,
@@ -51,79 +28,112 @@ selected_topics = st.multiselect("🧠 Wähle die Themenbereiche", list(topics.k
 
 question_type = st.selectbox("📝 Frageformat wählen", ["Gemischt", "Offene Fragen", "Multiple Choice", "Fallbasiert"])
 
-question_type_instruction = {
-    "Gemischt": "",
-    "Offene Fragen": "Es sollen ausschließlich offene Fragen sein.",
-    "Multiple Choice": "Es sollen ausschließlich Multiple-Choice-Fragen mit je vier Antwortmöglichkeiten und einer richtigen Antwort sein.",
-    "Fallbasiert": "Die Fragen sollen auf kurzen Unterrichts- oder Alltagssituationen basieren (Fallvignetten)."
-}[question_type]
+source_mode = st.radio("📦 Quelle der Fragen", ["Neu generieren", "Aus Fragenbank zusammenstellen"], horizontal=True)
 
 uploaded_files = st.file_uploader("📂 Lade deine Literatur hoch (PDF/DOCX/TXT)", type=["pdf", "docx", "txt"], accept_multiple_files=True)
 
-# --- Question Generator ---
-def generate_questions(text, topic_title, question_count):
-    system_prompt = (
-        "Du bist ein Bildungsexperte, der Fragen auf EQF-Niveau 6–7 erstellt. "
-        "Berücksichtige relevante Bildungstheorien, reale Unterrichtssituationen und "
-        "eine wissenschaftliche Tiefe. Verwende eine akademische Sprache auf Deutsch. "
-        f"Jede Frage muss thematisch zum folgenden Bereich passen: '{topic_title}'."
-    )
-
-    user_prompt = (
-        f"Generiere bitte {question_count} akademische Prüfungsfragen (offen oder MC) zum Thema '{topic_title}'. "
-        f"{question_type_instruction} "
-        "Die Fragen sollen auf Deutsch sein, keine Duplikate enthalten und das Antwortoptionenformat "
-        "dem in den Beispielprüfungen entsprechen (z.B. Anzahl der Antwortmöglichkeiten). "
-        "Verwende den folgenden deutschen Inhalt zur Inspiration:\n\n"
-        f"{text[:4000]}\n\n"
-        "Die Fragen sollen geeignet für Lehramtsstudierende auf Master-Niveau sein, Theorie und Praxis verbinden "
-        "und kritisch-reflexives Denken fördern."
-    )
-
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.4,
-        max_tokens=1800
-    )
+@st.cache_resource
+def get_bank():
+    return open_bank()
 
-    # Split output on double newlines (may split questions if they contain paragraphs)
-    # Optionally refine parsing depending on model output format
-    questions = response.choices[0].message.content.strip().split("\n\n")
+bank = get_bank()
+# One connection per script thread; the queue is written from several sessions
+queue = open_queue()
 
-    # Filter empty or too short fragments
-    questions = [q.strip() for q in questions if len(q.strip()) > 20]
-    return questions
+def offer_download(all_questions):
+    output_text = "\n".join(all_questions)
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
+    filename = f"EQF_Fragentext_{timestamp}.txt"
+    st.download_button("💾 Fragen als TXT herunterladen", data=output_text, file_name=filename, mime="text/plain")
 
 # --- Generate Button ---
-if st.button("🚀 Fragen generieren"):
-    if not uploaded_files:
-        st.warning("⚠️ Bitte lade mindestens eine Literaturdatei hoch.")
-        st.stop()
+if source_mode == "Aus Fragenbank zusammenstellen":
+    search_text = st.text_input("🔎 Stichwortsuche in der Fragenbank (optional)")
 
-    with st.spinner("📚 Texte werden verarbeitet..."):
-        combined_text = "\n\n".join([extract_text(f) for f in uploaded_files])
+generate_clicked = st.button("🚀 Fragen generieren")
 
+if generate_clicked and source_mode == "Aus Fragenbank zusammenstellen":
+    bank_format = None if question_type == "Gemischt" else question_type
     all_questions = []
 
     for topic in selected_topics:
         count = topics[topic]
         st.markdown(f"## 🧠 {topic}")
-        try:
-            questions = generate_questions(combined_text, topic, count)
-            for i, q in enumerate(questions, 1):
-                st.markdown(f"**Frage {i}:** {q.strip()}")
-                all_questions.append(f"{topic} - Frage {i}:\n{q.strip()}\n")
-            st.markdown(f"*Insgesamt {len(questions)} Fragen für '{topic}' generiert.*")
-        except Exception as e:
-            st.error(f"❌ Fehler bei der Generierung von Fragen für {topic}: {e}")
-
-    # --- Download as text file ---
+        questions = find_questions(bank, topic=topic, question_format=bank_format,
+                                   query=search_text or None, limit=count, random_order=True)
+        for i, q in enumerate(questions, 1):
+            text = format_question(q)
+            st.markdown(f"**Frage {i}:** {text}")
+            all_questions.append(f"{topic} - Frage {i}:\n{text}\n")
+        if len(questions) < count:
+            st.info(f"Nur {len(questions)} von {count} Fragen für '{topic}' in der Fragenbank gefunden.")
+
     if all_questions:
-        output_text = "\n".join(all_questions)
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
-        filename = f"EQF_Fragentext_{timestamp}.txt"
-        st.download_button("💾 Fragen als TXT herunterladen", data=output_text, file_name=filename, mime="text/plain")
+        offer_download(all_questions)
+
+elif generate_clicked:
+    if not uploaded_files:
+        st.warning("⚠️ Bitte lade mindestens eine Literaturdatei hoch.")
+        st.stop()
+
+    # Indexing and generation run in a background worker; the job survives reruns and disconnects
+    job_id = submit_job(queue, uploaded_files, [(t, topics[t]) for t in selected_topics], question_type)
+    # The key goes to the worker process only, never into the queue database
+    start_worker(queue, job_id, api_key)
+    st.session_state.job_id = job_id
+    st.query_params["job"] = job_id
+
+# --- Job progress ---
+jobs = recent_jobs(queue)
+if jobs:
+    job_ids = [j["id"] for j in jobs]
+    current = st.session_state.get("job_id") or st.query_params.get("job")
+    if current not in job_ids:
+        current = job_ids[0]
+    job_id = st.selectbox(
+        "📋 Generierungsaufträge", job_ids, index=job_ids.index(current),
+        format_func=lambda i: next(f"{i} – {j['status']} ({datetime.datetime.fromtimestamp(j['created']):%d.%m. %H:%M})" for j in jobs if j["id"] == i),
+    )
+    st.session_state.job_id = job_id
+    progress = job_progress(queue, job_id)
+
+    if progress["status"] in ("queued", "running") and not progress["ingested"]:
+        st.info("📚 Texte werden verarbeitet...")
+    if progress["ocr"]:
+        st.caption(f"🔍 {progress['ocr']}")
+
+    st.progress(progress["finished"] / max(progress["total"], 1),
+                text=f"{progress['finished']} von {progress['total']} Themenbereichen fertig")
+
+    all_questions = []
+    for topic in progress["topics"]:
+        if topic["status"] == "pending":
+            continue
+        st.markdown(f"## 🧠 {topic['topic']}")
+        if topic["status"] == "failed":
+            st.error(f"❌ Fehler bei der Generierung von Fragen für {topic['topic']}: {topic['error']}")
+            continue
+        for i, q in enumerate(topic["questions"], 1):
+            text = format_question(q)
+            st.markdown(f"**Frage {i}:** {text}")
+            all_questions.append(f"{topic['topic']} - Frage {i}:\n{text}\n")
+        st.markdown(f"*Insgesamt {len(topic['questions'])} Fragen für '{topic['topic']}' generiert.*")
+
+    if progress["status"] == "failed":
+        st.error(f"❌ Auftrag abgebrochen: {progress['error']}")
+    if all_questions and progress["status"] in ("done", "failed"):
+        offer_download(all_questions)
+
+    # Poll until the worker has finished the job
+    polling = progress["status"] in ("queued", "running")
+    if polling and job_id == st.query_params.get("job"):
+        # Only the submitting browser resumes a job whose worker died, with its own key
+        start_worker(queue, job_id, api_key)
+else:
+    polling = False
+
+render_debug_panel()
+
+if polling:
+    time.sleep(2)
+    st.rerun()
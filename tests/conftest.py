@@ -0,0 +1,11 @@
+import pytest
+
+import tracing
+
+
+@pytest.fixture(autouse=True)
+def trace_path(tmp_path, monkeypatch):
+    # Spans go to a per-test file instead of traces.jsonl in the working directory
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_PATH", str(path))
+    return path
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+ensemble = pytest.importorskip("sklearn.ensemble")
+
+import numpy as np
+
+import compiled_forest
+from compiled_forest import TOLERANCE, ParityError, export_forest, load_forest, parity_error
+
+
+@pytest.fixture(scope="module")
+def climate_fit():
+    """A forest fitted on climate-like rows (year, month, noise): (model, X)."""
+    rng = np.random.default_rng(42)
+    X = np.column_stack([rng.integers(1950, 2025, 5000), rng.integers(1, 13, 5000), rng.normal(size=5000)])
+    y = 24 + 2 * np.cos(2 * np.pi * X[:, 1] / 12) + 0.02 * (X[:, 0] - 1950) + 0.3 * X[:, 2]
+    model = ensemble.RandomForestRegressor(n_estimators=30, random_state=42).fit(X, y)
+    return model, X
+
+
+def test_matches_sklearn_including_missing_values(climate_fit, tmp_path):
+    model, X = climate_fit
+    forest = export_forest(model, str(tmp_path / "climate.forest"), X[:1000])
+
+    rng = np.random.default_rng(7)
+    X_test = np.column_stack([rng.integers(1950, 2040, 5000), rng.integers(1, 13, 5000), rng.normal(size=5000)])
+    X_test[::97, 2] = np.nan
+    assert parity_error(model, forest, X_test) <= TOLERANCE
+    # Single rows take the same path as batches
+    assert forest.predict(X_test[:1])[0] == pytest.approx(model.predict(X_test[:1].astype(np.float32))[0], abs=TOLERANCE)
+
+
+def test_export_saves_a_memory_mapped_forest(climate_fit, tmp_path):
+    model, X = climate_fit
+    path = str(tmp_path / "climate.forest")
+    exported = export_forest(model, path, X[:100])
+    loaded = load_forest(path)
+
+    assert isinstance(loaded.value, np.memmap)
+    assert loaded.n_trees == 30
+    np.testing.assert_array_equal(loaded.predict(X[:100]), exported.predict(X[:100]))
+    with pytest.raises(ValueError):
+        loaded.predict(X[:10, :2])
+
+
+def test_parity_failure_leaves_nothing_on_disk(climate_fit, tmp_path, monkeypatch):
+    model, X = climate_fit
+    path = str(tmp_path / "climate.forest")
+    export_forest(model, path, X[:100])
+
+    monkeypatch.setattr(compiled_forest, "parity_error", lambda *args: 1.0)
+    with pytest.raises(ParityError):
+        export_forest(model, path, X[:100])
+    # The previously exported forest is removed too, so no process loads it unchecked
+    assert not os.path.exists(path)
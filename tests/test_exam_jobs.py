@@ -0,0 +1,106 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import exam_jobs
+from exam_jobs import Heartbeat, claim_job, job_progress, open_queue, run_job, submit_job
+from question_bank import open_bank
+
+TOPICS = [("Teil 2: Bildung und Ungleichheit", 2), ("Teil 4: Interdisziplinäres Lernen", 2)]
+TEXT = "Bildung und Ungleichheit im interdisziplinären Lernen der Ganztagsschule. " * 200
+
+
+class _Upload(io.BytesIO):
+    type, name = "text/plain", "literatur.txt"
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path / "jobs.db"), open_queue(str(tmp_path / "jobs.db"))
+
+
+def _job(conn, token):
+    job_id = submit_job(conn, [_Upload(TEXT.encode())], TOPICS, "Offene Fragen")
+    assert claim_job(conn, job_id, token)
+    return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def _questions(api_key, passage, topic, count, question_type, usage=None, source=""):
+    assert "Ungleichheit" in passage
+    return [{"stem": f"{topic} – Frage {i}", "options": [], "answer": "", "topic": topic,
+             "format": question_type, "source": source} for i in range(count)]
+
+
+def test_live_lease_blocks_a_second_worker(queue):
+    _, conn = queue
+    job = _job(conn, "first")
+    assert not claim_job(conn, job["id"], "second")
+    # Renewing is claiming again with the same token
+    assert claim_job(conn, job["id"], "first")
+
+
+def test_expired_lease_is_taken_over_and_heartbeat_notices(queue, monkeypatch):
+    path, conn = queue
+    monkeypatch.setattr(exam_jobs, "HEARTBEAT_SECONDS", 0.05)
+    job = _job(conn, "first")
+    heartbeat = Heartbeat(path, job["id"], "first")
+    heartbeat.start()
+    try:
+        time.sleep(0.2)
+        assert not claim_job(conn, job["id"], "second", lease=0.1)
+        # The first worker stalls (no more renewals), then its lease runs out
+        conn.execute("UPDATE jobs SET heartbeat = heartbeat - 60 WHERE id = ?", (job["id"],))
+        assert claim_job(conn, job["id"], "second", lease=30)
+        assert heartbeat.lost.wait(1)
+    finally:
+        heartbeat.stop()
+
+
+def test_worker_indexes_uploads_then_generates(queue, tmp_path, monkeypatch):
+    _, conn = queue
+    monkeypatch.setattr(exam_jobs, "generate_questions", _questions)
+    job = _job(conn, "worker")
+    assert os.listdir(os.path.join(job["dir"], "uploads"))
+
+    run_job(conn, job, open_bank(str(tmp_path / "bank.db")), "sk-test", threading.Event())
+    progress = job_progress(conn, job["id"])
+    assert progress["status"] == "done"
+    assert progress["ingested"]
+    assert progress["finished"] == progress["total"] == len(TOPICS)
+    assert progress["topics"][0]["questions"][0]["source"] == "literatur.txt"
+    assert not os.path.exists(job["dir"])
+
+
+def test_job_fails_when_no_topic_succeeds(queue, tmp_path, monkeypatch):
+    _, conn = queue
+
+    def broken(*args, **kwargs):
+        raise ValueError("reply is not a valid JSON array")
+
+    monkeypatch.setattr(exam_jobs, "generate_questions", broken)
+    job = _job(conn, "worker")
+    run_job(conn, job, open_bank(str(tmp_path / "bank.db")), "sk-test", threading.Event())
+    progress = job_progress(conn, job["id"])
+    assert progress["status"] == "failed"
+    assert all(t["status"] == "failed" for t in progress["topics"])
+
+
+def test_lost_lease_stops_before_the_next_topic(queue, tmp_path, monkeypatch):
+    _, conn = queue
+    lost = threading.Event()
+
+    def first_then_lost(*args, **kwargs):
+        lost.set()
+        return _questions(*args, **kwargs)
+
+    monkeypatch.setattr(exam_jobs, "generate_questions", first_then_lost)
+    job = _job(conn, "worker")
+    run_job(conn, job, open_bank(str(tmp_path / "bank.db")), "sk-test", lost)
+    progress = job_progress(conn, job["id"])
+    # Checkpointed topics stay done; the job is left for the new owner
+    assert progress["status"] == "running"
+    assert [t["status"] for t in progress["topics"]] == ["done", "pending"]
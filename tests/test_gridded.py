@@ -0,0 +1,55 @@
+import tracemalloc
+
+import pytest
+
+xr = pytest.importorskip("xarray")
+dsa = pytest.importorskip("dask.array")
+pytest.importorskip("zarr")
+
+import numpy as np
+import pandas as pd
+
+from gridded import compute, load_regional_series
+
+
+@pytest.fixture(scope="module")
+def daily_cube(tmp_path_factory):
+    """30 years of daily 0.1° temperatures over Tanzania in Zarr, written chunk by chunk: (store, bytes)."""
+    time = pd.date_range("1991-01-01", periods=365 * 30, freq="D")
+    lat = np.arange(-12.0, -0.9, 0.1)
+    lon = np.arange(29.0, 40.6, 0.1)
+    seasonal = 24 + 2 * np.cos(2 * np.pi * (time.dayofyear.values - 30) / 365)
+    tas = (
+        dsa.random.random((len(time), len(lat), len(lon)), chunks=(365, -1, -1)).astype("float32")
+        + dsa.from_array(seasonal.astype("float32"), chunks=365)[:, None, None]
+        + 273.15
+    )
+    ds = xr.Dataset({"tas": (("time", "lat", "lon"), tas, {"units": "K"})},
+                    coords={"time": time, "lat": lat, "lon": lon})
+    store = str(tmp_path_factory.mktemp("gridded") / "synthetic.zarr")
+    compute(ds.to_zarr(store, compute=False))
+    return store, tas.nbytes
+
+
+def test_cube_is_reduced_out_of_core(daily_cube):
+    store, size = daily_cube
+    tracemalloc.start()
+    try:
+        df = load_regional_series(store, "Tanzania")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(df) == 12 * 30
+    assert peak <= size // 4, f"peak {peak} for a {size} byte cube"
+
+
+def test_series_matches_chart_csv_layout(daily_cube):
+    df = load_regional_series(daily_cube[0], "Lake Victoria")
+    assert list(df.columns[:3]) == ["Year", "Month", "MonthName"]
+    # Kelvin converted; the seasonal cycle peaks around the end of January
+    monthly = df.groupby("Month")["Temperature"].mean()
+    assert 22 < monthly.min() < monthly.max() < 27
+    assert monthly.idxmax() in (1, 2)
+    # Anomalies over the baseline period average to zero
+    assert abs(df["TemperatureAnomaly"].mean()) < 0.05
@@ -0,0 +1,143 @@
+import io
+import tracemalloc
+
+import pytest
+
+import ingest
+from ingest import close_passage_index, ingest_files, open_passage_index, select_context
+
+# Streaming ingestion must keep peak memory flat: the traced peak while
+# indexing may not exceed a fixed ceiling, nor grow with the upload size.
+# The upload itself is built before tracing starts, as Streamlit holds it too.
+
+CEILING = 8 * 1024 * 1024
+LINE = "Bildung und Ungleichheit in multiprofessionellen Teams der Ganztagsschule. "
+
+
+class _Source(io.RawIOBase):
+    # Synthetic TXT content that produces `size` bytes without holding them
+    def __init__(self, size):
+        self.remaining = size
+        self.line = LINE.encode()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        n = min(len(buf), self.remaining)
+        buf[:n] = (self.line * (n // len(self.line) + 1))[:n]
+        self.remaining -= n
+        return n
+
+
+class _TxtUpload(io.BufferedReader):
+    # Mimics Streamlit's UploadedFile (a file object with .type and .name)
+    type, name = "text/plain", "synthetic.txt"
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, data, type, name):
+        super().__init__(data)
+        self.type, self.name, self.size = type, name, len(data)
+
+
+def _pdf(pages, chars_per_page=3000):
+    """A minimal text PDF with one Helvetica text line per 100 characters."""
+    lines = [LINE[i % len(LINE):] + LINE for i in range(chars_per_page // 100)]
+    stream = "BT /F1 8 Tf 20 800 Td 10 TL " + " ".join(f"({line[:100]}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _docx(paragraphs):
+    docx = pytest.importorskip("docx")
+    document = docx.Document()
+    for _ in range(paragraphs):
+        document.add_paragraph(LINE * 10)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def _peak_while_ingesting(upload):
+    conn = open_passage_index()
+    try:
+        tracemalloc.start()
+        count = ingest_files(conn, [upload])
+        context = select_context(conn, "Teil 2: Bildung und Ungleichheit")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        close_passage_index(conn)
+    assert count > 0
+    assert "Ungleichheit" in context
+    return peak
+
+
+def _assert_flat(small, large):
+    assert max(small, large) <= CEILING
+    assert large <= 2 * small + 1024 * 1024, f"peak grows with upload size: {small} -> {large}"
+
+
+def test_txt_memory_ceiling():
+    peaks = [_peak_while_ingesting(_TxtUpload(_Source(mb * 1024 * 1024))) for mb in (4, 64)]
+    _assert_flat(*peaks)
+
+
+def test_pdf_memory_ceiling(monkeypatch):
+    pytest.importorskip("PyPDF2")
+    # Text-layer path only; OCR depends on the Tesseract install
+    monkeypatch.setattr(ingest, "ocr_available", lambda: False)
+    peaks = [_peak_while_ingesting(_Upload(_pdf(pages), "application/pdf", "synthetic.pdf")) for pages in (50, 500)]
+    _assert_flat(*peaks)
+
+
+def test_docx_memory_ceiling():
+    mime = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    peaks = [_peak_while_ingesting(_Upload(_docx(n), mime, "synthetic.docx")) for n in (500, 5000)]
+    _assert_flat(*peaks)
+
+
+def test_docx_text_matches_python_docx():
+    docx = pytest.importorskip("docx")
+    document = docx.Document()
+    document.add_paragraph("Erster Absatz")
+    run = document.add_paragraph("Zweiter").add_run()
+    run.add_tab()
+    run.add_text("Absatz")
+    table = document.add_table(rows=1, cols=1)
+    table.cell(0, 0).text = "Tabellenzelle"
+    out = io.BytesIO()
+    document.save(out)
+
+    text = "\n".join(ingest.iter_docx_pages(io.BytesIO(out.getvalue())))
+    assert text.startswith("Erster Absatz\nZweiter\tAbsatz")
+    # Unlike doc.paragraphs, text in tables is kept
+    assert "Tabellenzelle" in text
+
+
+def test_passages_overlap_and_cover_the_text():
+    pages = ["a" * 100 + " " + "b" * 100] * 20
+    passages = list(ingest.iter_passages(pages, size=300, overlap=50))
+    assert all(len(p) <= 300 for p in passages)
+    assert sum(len(p) for p in passages) >= sum(len(p) for p in pages)
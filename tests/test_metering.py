@@ -0,0 +1,63 @@
+import pytest
+
+import metering
+from metering import BudgetExceeded, Meter, cost_usd
+
+
+@pytest.fixture
+def meter(tmp_path):
+    return Meter(str(tmp_path / "usage.db"), session_budget=0.10, daily_budget=1.00)
+
+
+def test_snapshot_uses_base_model_price():
+    assert cost_usd("gpt-4o-mini-2024-07-18", 1000, 1000) == cost_usd("gpt-4o-mini", 1000, 1000)
+
+
+def test_degrades_over_budget_then_refuses(meter):
+    assert meter.choose_model("gpt-4", "s1") == "gpt-4"
+    # 0.03 + 0.06 USD
+    meter.record("gpt-4", 1000, 1000, session="s1")
+    assert meter.choose_model("gpt-4", "s1") == "gpt-4"
+    # 0.0015 + 0.012 USD: over budget, below HARD_LIMIT_FACTOR x budget
+    meter.record("gpt-4o-mini", 10_000, 20_000, session="s1")
+    assert meter.choose_model("gpt-4", "s1") == "gpt-4o-mini"
+    # Other sessions keep the full model
+    assert meter.choose_model("gpt-4", "s2") == "gpt-4"
+
+    meter.record("gpt-4o-mini", 100_000, 100_000, session="s1")
+    with pytest.raises(BudgetExceeded, match="session budget.* of 0.100 USD"):
+        meter.choose_model("gpt-4", "s1")
+
+
+def test_refuses_without_cheaper_model(meter):
+    meter.record("gpt-4o-mini", 200_000, 200_000, session="s1")
+    with pytest.raises(BudgetExceeded):
+        meter.choose_model("gpt-4o-mini", "s1")
+
+
+def test_daily_budget_applies_across_sessions(meter):
+    for n in range(12):
+        meter.record("gpt-4", 1000, 1000, session=f"s{n}")
+    assert meter.choose_model("gpt-4", "new") == "gpt-4o-mini"
+    for n in range(12, 17):
+        meter.record("gpt-4", 1000, 1000, session=f"s{n}")
+    with pytest.raises(BudgetExceeded, match="daily budget"):
+        meter.choose_model("gpt-4", "new")
+
+
+def test_reports_match_the_call_log(meter, monkeypatch):
+    monkeypatch.setattr(metering, "_today", lambda: "2025-01-01")
+    meter.record("gpt-4", 1000, 500, app="exam", session="s1", topic="Teil 1")
+    monkeypatch.setattr(metering, "_today", lambda: "2025-01-02")
+    meter.record("gpt-4o-mini", 2000, 100, app="avatar", session="s1", scenario="Elterngespräch")
+    meter.record("gpt-4", 100, 100, app="exam", session="s2", topic="Teil 1")
+
+    by_session = meter.report(["session"])
+    assert [(r["session"], r["calls"], r["prompt_tokens"]) for r in by_session] == [("s1", 2, 3000), ("s2", 1, 100)]
+    assert meter.report(["session"], since="2025-01-02")[0]["calls"] == 1
+    assert [r["calls"] for r in meter.report(["session", "app"])] == [1, 1, 1]
+
+    by_day = meter.report(["day"])
+    assert sum(r["cost_usd"] for r in by_day) == pytest.approx(sum(r["cost_usd"] for r in by_session))
+    with pytest.raises(ValueError):
+        meter.report(["user"])
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from question_bank import (
+    FORMAT_MC,
+    FORMAT_OPEN,
+    add_questions,
+    find_questions,
+    format_question,
+    open_bank,
+    parse_questions,
+)
+
+STEM = "Welche Rolle spielt die Schulsozialarbeit in multiprofessionellen Teams?"
+OPTIONS = ["Beratung", "Unterricht", "Verwaltung", "Keine"]
+
+
+def _item(**overrides):
+    item = {"frage": STEM, "optionen": OPTIONS, "antwort": "A"}
+    item.update(overrides)
+    return item
+
+
+@pytest.mark.parametrize("options", [
+    OPTIONS,
+    [f"{letter}) {option}" for letter, option in zip("ABCD", OPTIONS)],
+    dict(zip("ABCD", OPTIONS)),
+    "A) Beratung B) Unterricht C) Verwaltung D) Keine",
+])
+def test_option_shapes(options):
+    [record] = parse_questions(json.dumps([_item(optionen=options)]), "Teams")
+    assert record["options"] == OPTIONS
+    assert record["format"] == FORMAT_MC
+    assert "A) A)" not in format_question(record)
+
+
+def test_json_in_prose_and_code_fence():
+    raw = "Hier sind die Fragen:\n```json\n" + json.dumps([_item(), _item(frage=STEM + " (2)")]) + "\n```"
+    assert len(parse_questions(raw, "Teams")) == 2
+
+
+def test_truncated_reply_keeps_complete_objects():
+    raw = json.dumps([_item(), _item(frage=STEM + " (2)"), _item(frage=STEM + " (3)")])
+    # Cut off at max_tokens inside the third object
+    records = parse_questions(raw[:raw.rindex(STEM + " (3)") + 10], "Teams")
+    assert [r["stem"] for r in records] == [STEM, STEM + " (2)"]
+
+
+def test_unrecoverable_json_raises():
+    with pytest.raises(ValueError):
+        parse_questions('[{"frage": "' + STEM, "Teams")
+
+
+def test_block_fallback():
+    raw = f"1. {STEM}\n\nA) Beratung\nB) Unterricht\nRichtige Antwort: A\n\n2. Beschreiben Sie eine Fallsituation aus der Praxis."
+    first, second = parse_questions(raw, "Teams", requested_format=FORMAT_OPEN)
+    assert first["stem"] == STEM
+    assert first["options"] == ["Beratung", "Unterricht"]
+    assert first["answer"] == "A"
+    assert second["format"] == FORMAT_OPEN
+
+
+def test_search_ignores_source(tmp_path):
+    conn = open_bank(str(tmp_path / "bank.db"))
+    records = parse_questions(json.dumps([_item()]), "Teams", source="Ganztagsschule")
+    assert add_questions(conn, records) == 1
+    assert add_questions(conn, records) == 0
+    assert find_questions(conn, query="Schulsozialarbeit")
+    assert not find_questions(conn, query="Ganztagsschule")
@@ -0,0 +1,115 @@
+import multiprocessing
+import socket
+import threading
+
+import pytest
+
+from session_store import RedisStore, RespClient, RespError, SQLiteStore, StandInServer
+
+MESSAGES = [
+    {"role": "system", "content": "Du bist eine Lehrkraft."},
+    {"role": "user", "content": "Hallo"},
+    {"role": "assistant", "content": "Guten Tag! " * 100},
+]
+
+
+@pytest.fixture
+def stand_in(tmp_path):
+    """A stand-in server with an AOF on an ephemeral port: (server, address)."""
+    server = StandInServer(str(tmp_path / "sessions.aof"))
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=server.handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield server, listener.getsockname()
+    listener.close()
+    server.aof.close()
+
+
+def _append_from_process(path, n):
+    store = SQLiteStore(path)
+    for i in range(300):
+        store.append("s1", [{"role": "user", "content": f"{n}-{i}"}])
+
+
+def test_sqlite_concurrent_appends_get_distinct_seqs(tmp_path):
+    # Separate processes, like Streamlit replicas sharing the file
+    path = str(tmp_path / "sessions.db")
+    SQLiteStore(path).replace("s1", MESSAGES[:1])
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_append_from_process, args=(path, n)) for n in range(8)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    assert [p.exitcode for p in processes] == [0] * 8
+    conversation = SQLiteStore(path).load("s1")
+    assert len(conversation) == 1 + 8 * 300
+    # Each writer's messages keep their order
+    for n in range(8):
+        assert [m["content"] for m in conversation if m["content"].startswith(f"{n}-")] == [f"{n}-{i}" for i in range(300)]
+
+
+def test_resp_client_pipeline(stand_in):
+    _, address = stand_in
+    client = RespClient(address)
+    assert client.execute(b"PING") == b"PONG"
+    assert client.pipeline([(b"RPUSH", b"k", b"a", b"b"), (b"LLEN", b"k"), (b"LRANGE", b"k", b"0", b"-1")]) == [
+        2, 2, [b"a", b"b"]]
+    assert client.execute(b"LRANGE", b"missing", b"0", b"-1") == []
+    with pytest.raises(RespError):
+        client.execute(b"HGET", b"k", b"f")
+
+
+def test_redis_store_round_trip(stand_in):
+    _, (host, port) = stand_in
+    store = RedisStore(f"redis://{host}:{port}/1", ttl=60)
+    store.replace("s1", MESSAGES[:2])
+    store.append("s1", MESSAGES[2:])
+    assert store.load("s1") == MESSAGES
+    store.replace("s1", MESSAGES[:1])
+    assert store.load("s1") == MESSAGES[:1]
+
+
+def test_aof_replay_restores_lists_and_expiry(tmp_path):
+    path = str(tmp_path / "sessions.aof")
+    server = StandInServer(path)
+    server.apply([b"RPUSH", b"k", b"a", b"b"])
+    server.apply([b"EXPIRE", b"k", b"3600"])
+    server.apply([b"RPUSH", b"gone", b"x"])
+    server.apply([b"DEL", b"gone"])
+    server.aof.close()
+
+    restarted = StandInServer(path)
+    assert restarted.lists == {b"k": [b"a", b"b"]}
+    assert restarted.expires[b"k"] == int(server.expires[b"k"])
+    restarted.aof.close()
+
+
+def test_aof_replay_drops_a_torn_last_command(tmp_path):
+    path = str(tmp_path / "sessions.aof")
+    server = StandInServer(path)
+    server.apply([b"RPUSH", b"k", b"a"])
+    server.apply([b"RPUSH", b"k", b"second item"])
+    server.aof.close()
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-6])
+
+    restarted = StandInServer(path)
+    assert restarted.lists == {b"k": [b"a"]}
+    # New writes start after the last complete command
+    restarted.apply([b"RPUSH", b"k", b"b"])
+    restarted.aof.close()
+    replayed = StandInServer(path)
+    assert replayed.lists == {b"k": [b"a", b"b"]}
+    replayed.aof.close()
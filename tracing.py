@@ -0,0 +1,136 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# --- Lightweight tracing ---
+# Spans are appended to a JSONL file, one object per finished span, using the
+# field names of the OpenTelemetry span model (trace/span ids, unix-nano
+# timestamps, attributes). Set TRACE_PATH="" to switch tracing off.
+
+TRACE_PATH = os.environ.get("TRACE_PATH", "traces.jsonl")
+PANEL_WINDOW = 5000
+
+_current = contextvars.ContextVar("current_span", default=None)
+_write_lock = threading.Lock()
+
+
+def _export(record):
+    if not TRACE_PATH:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _write_lock:
+        with open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def start_span(name, **attributes):
+    parent = _current.get()
+    span = {
+        "name": name,
+        "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_span_id": parent["span_id"] if parent else None,
+        "start_time_unix_nano": time.time_ns(),
+        "attributes": dict(attributes),
+        "status": "OK",
+        "_start": time.perf_counter(),
+    }
+    span["_token"] = _current.set(span)
+    return span
+
+
+def end_span(span, error=None):
+    if error is not None:
+        span["status"] = "ERROR"
+        span["attributes"]["error"] = str(error)
+    duration = time.perf_counter() - span.pop("_start")
+    span["end_time_unix_nano"] = span["start_time_unix_nano"] + int(duration * 1e9)
+    span["duration_ms"] = round(duration * 1000, 3)
+    token = span.pop("_token")
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Ended from a different context than it was started in
+        pass
+    _export(span)
+
+
+@contextmanager
+def span(name, **attributes):
+    current = start_span(name, **attributes)
+    try:
+        yield current
+    except BaseException as e:
+        # Streamlit's st.stop()/rerun are control flow, not failures
+        if type(e).__name__ in ("StopException", "RerunException"):
+            end_span(current)
+        else:
+            end_span(current, error=e)
+        raise
+    else:
+        end_span(current)
+
+
+def set_attributes(current, **attributes):
+    if current is not None:
+        current["attributes"].update(attributes)
+
+
+# --- Latency percentiles ---
+def load_spans(path=None, window=PANEL_WINDOW):
+    path = path or TRACE_PATH
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = deque(f, maxlen=window)
+    spans = []
+    for line in lines:
+        try:
+            spans.append(json.loads(line))
+        except ValueError:
+            continue
+    return spans
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_summary(spans):
+    """Count and p50/p90/p99/max duration in ms per span name."""
+    durations = defaultdict(list)
+    for s in spans:
+        durations[s["name"]].append(s["duration_ms"])
+    rows = []
+    for name, values in sorted(durations.items()):
+        values.sort()
+        rows.append({
+            "span": name,
+            "count": len(values),
+            "p50_ms": _percentile(values, 0.5),
+            "p90_ms": _percentile(values, 0.9),
+            "p99_ms": _percentile(values, 0.99),
+            "max_ms": values[-1],
+        })
+    return rows
+
+
+def render_debug_panel():
+    """Show latency percentiles in the app when opened with ?debug=1."""
+    import streamlit as st
+
+    if st.query_params.get("debug") != "1":
+        return
+    with st.expander("🐞 Debug: Latenzen / Latency percentiles", expanded=True):
+        spans = load_spans()
+        if not spans:
+            st.write("No spans recorded yet.")
+            return
+        st.dataframe(latency_summary(spans), use_container_width=True)
+        st.caption(f"Last {len(spans)} spans from {TRACE_PATH}")